@@ -5,7 +5,6 @@ Customized to work with Frames from https://github.com/slaypni/fastdtw .
 
 import numbers
 import numpy as np
-from collections import defaultdict
 
 # try:
 #     range = xrange
@@ -13,7 +12,7 @@ from collections import defaultdict
 #     pass
 
 
-def fastdtw(x, y, radius=1, dist=None):
+def fastdtw(x, y, radius=1, dist=None, batch_dist=None):
     """Compute the approximate distance between 2 time series with O(N) time and memory complexity.
 
     Parameters
@@ -32,6 +31,19 @@ def fastdtw(x, y, radius=1, dist=None):
         dist is an int of value p > 0, then the p-norm will be used. If
         dist is a function then dist(x[i], y[j]) will be used. If dist is
         None then abs(x[i] - y[j]) will be used.
+        dist can also be a sequence, with the distance to use at each
+        resolution level: dist[0] is used at full resolution, dist[1] at
+        half resolution and so on, the last one for all the coarser levels.
+        The coarse levels only place the search band, so a cheap distance
+        (see climbing_wire.video.frame_dist) is usually enough there.
+    batch_dist : function
+        Optional batched version of dist: batch_dist(ii, jj) must return an
+        array with the distances between x[ii[k]] and y[jj[k]]. The indices
+        always refer to the full resolution x and y, and all the cells of a
+        window are evaluated with a single call, so the distances can be
+        vectorized or computed in parallel (see ProcessPoolDistance).
+        If batch_dist is given, dist is ignored. As for dist, a sequence
+        of batch_dist can be given, one for each resolution level.
 
     Returns
     -------
@@ -50,7 +62,8 @@ def fastdtw(x, y, radius=1, dist=None):
     (2.0, [(0, 0), (1, 0), (2, 1), (3, 2), (4, 2)])
     """
     # x, y, dist = __prep_inputs(x, y, dist)
-    return __fastdtw(x, y, radius, dist)
+    costs = __level_costs(x, y, dist, batch_dist)
+    return __fastdtw(np.arange(len(x)), np.arange(len(y)), radius, costs)
 
 
 def __difference(a, b):
@@ -61,17 +74,53 @@ def __norm(p):
     return lambda a, b: np.linalg.norm(np.atleast_1d(a) - np.atleast_1d(b), p)
 
 
-def __fastdtw(x, y, radius, dist):
+def __cell_costs(x, y, dist, batch_dist):
+    """Build the batched cost function on the indices of x and y.
+
+    The plain dist is called one cell at a time, in the same order as the
+    cells of the window.
+    """
+    if batch_dist is not None:
+        return lambda ii, jj: np.asarray(batch_dist(ii, jj), dtype=float)
+    if dist is None:
+        dist = __difference
+    elif isinstance(dist, numbers.Number):
+        dist = __norm(p=dist)
+    return lambda ii, jj: np.fromiter(
+        (dist(x[i], y[j]) for i, j in zip(ii, jj)), dtype=float, count=len(ii)
+    )
+
+
+def __level_costs(x, y, dist, batch_dist):
+    """Build the batched cost function for each resolution level."""
+    if batch_dist is not None:
+        if callable(batch_dist):
+            batch_dist = [batch_dist]
+        return [__cell_costs(x, y, None, bd) for bd in batch_dist]
+    if dist is None or callable(dist) or isinstance(dist, numbers.Number):
+        dist = [dist]
+    return [__cell_costs(x, y, d, None) for d in dist]
+
+
+def __fastdtw(x, y, radius, costs, level=0):
+    """Run fastdtw on the indices x and y of the input series.
+
+    costs[level] is the cost function for this resolution level,
+    the last one is used for all the coarser levels.
+    """
     min_time_size = radius + 2
+    cost = costs[min(level, len(costs) - 1)]
 
     if len(x) < min_time_size or len(y) < min_time_size:
-        return dtw(x, y, dist=dist)
+        return __dtw(x, y, None, cost)
 
     x_shrunk = __reduce_by_half(x)
     y_shrunk = __reduce_by_half(y)
-    distance, path = __fastdtw(x_shrunk, y_shrunk, radius=radius, dist=dist)
+    distance, path = __fastdtw(
+        x_shrunk, y_shrunk, radius=radius, costs=costs, level=level + 1
+    )
     window = __expand_window(path, len(x), len(y), radius)
-    return __dtw(x, y, window, dist=dist)
+    return __dtw(x, y, window, cost)
 
 
 # def __prep_inputs(x, y, dist):
@@ -91,7 +140,7 @@ def __fastdtw(x, y, radius, dist):
 #     return x, y, dist
 
 
-def dtw(x, y, dist=None):
+def dtw(x, y, dist=None, batch_dist=None):
     """Return the distance between 2 time series without approximation.
 
     Parameters
@@ -105,6 +154,15 @@ def dtw(x, y, dist=None):
         dist is an int of value p > 0, then the p-norm will be used. If
         dist is a function then dist(x[i], y[j]) will be used. If dist is
         None then abs(x[i] - y[j]) will be used.
+        As in fastdtw, dist can also be a sequence: only dist[0] is used.
+    batch_dist : function
+        Optional batched version of dist: batch_dist(ii, jj) must return an
+        array with the distances between x[ii[k]] and y[jj[k]]. The indices
+        always refer to the full resolution x and y, and all the cells of a
+        window are evaluated with a single call, so the distances can be
+        vectorized or computed in parallel (see ProcessPoolDistance).
+        If batch_dist is given, dist is ignored. As for dist, only
+        batch_dist[0] is used if it is a sequence.
 
     Returns
     -------
@@ -123,74 +181,176 @@ def dtw(x, y, dist=None):
     (2.0, [(0, 0), (1, 0), (2, 1), (3, 2), (4, 2)])
     """
     # x, y, dist = __prep_inputs(x, y, dist)
-    return __dtw(x, y, None, dist)
+    cost = __level_costs(x, y, dist, batch_dist)[0]
+    return __dtw(np.arange(len(x)), np.arange(len(y)), None, cost)
+
+
+# backpointer directions of a cell in the cost table
+STEP_UP = 0  # from (i - 1, j)
+STEP_LEFT = 1  # from (i, j - 1)
+STEP_DIAG = 2  # from (i - 1, j - 1)
+
+# number of vectorized passes to resolve the horizontal moves in a row,
+# before falling back to a plain loop
+MAX_LEFT_PASSES = 8
+
+
+def __dtw(x, y, window, cost):
+    """Run DTW restricted to a banded window.
 
+    x and y are the indices of the elements of the input series at this
+    resolution, cost(ii, jj) returns the distances between them.
 
-def __dtw(x, y, window, dist):
+    The window is a pair of arrays (starts, ends): row i of the cost table
+    spans the columns [starts[i], ends[i]). If the window is None, the full
+    table is used. The accumulated cost and the backpointers are stored
+    row after row in flat arrays, only for the cells inside the band.
+    """
     len_x, len_y = len(x), len(y)
     if window is None:
-        window = [(i, j) for i in range(len_x) for j in range(len_y)]
-    window = ((i + 1, j + 1) for i, j in window)
-    # D = defaultdict(lambda: (float("inf"),))
-    # D = defaultdict(lambda: (float("inf"), 0, 0))  # (distance, i, j)
-    D: dict[tuple[int, int], tuple[float, int, int]] = defaultdict(
-        lambda: (float("inf"), 0, 0)
-    )
-    # (distance, i, j)
-    D[0, 0] = (0, 0, 0)
-    for i, j in window:
-        dt = dist(x[i - 1], y[j - 1])
-        D[i, j] = min(
-            (D[i - 1, j][0] + dt, i - 1, j),
-            (D[i, j - 1][0] + dt, i, j - 1),
-            (D[i - 1, j - 1][0] + dt, i - 1, j - 1),
-            key=lambda a: a[0],
-        )
+        starts = np.zeros(len_x, dtype=np.intp)
+        ends = np.full(len_x, len_y, dtype=np.intp)
+    else:
+        starts, ends = window
+    widths = ends - starts
+    offsets = np.zeros(len_x + 1, dtype=np.intp)
+    np.cumsum(widths, out=offsets[1:])
+
+    # evaluate the distances of all the cells in the window at once
+    cell_rows = np.repeat(np.arange(len_x), widths)
+    cell_cols = np.arange(offsets[-1]) - np.repeat(offsets[:-1] - starts, widths)
+    cell_dist = cost(x[cell_rows], y[cell_cols])
+
+    cost = np.empty(offsets[-1], dtype=float)
+    steps = np.empty(offsets[-1], dtype=np.uint8)
+
+    for i in range(len_x):
+        s, e = starts[i], ends[i]
+        dt = cell_dist[offsets[i] : offsets[i + 1]]
+        if i == 0:
+            # only the origin is reachable from the row before the first
+            up = np.full(e - s, np.inf)
+            diag = np.full(e - s, np.inf)
+            if s == 0 and e > 0:
+                diag[0] = 0
+        else:
+            prev_row = cost[offsets[i - 1] : offsets[i]]
+            ps, pe = starts[i - 1], ends[i - 1]
+            up = __band_slice(prev_row, ps, pe, s, e)
+            diag = __band_slice(prev_row, ps, pe, s - 1, e - 1)
+        row_cost, row_steps = __row_recurrence(up + dt, diag + dt, dt)
+        cost[offsets[i] : offsets[i + 1]] = row_cost
+        steps[offsets[i] : offsets[i + 1]] = row_steps
+
     path = []
-    i, j = len_x, len_y
-    while not (i == j == 0):
-        path.append((i - 1, j - 1))
-        i, j = D[i, j][1], D[i, j][2]
+    i, j = len_x - 1, len_y - 1
+    while i >= 0 and j >= 0:
+        if not starts[i] <= j < ends[i]:
+            break
+        path.append((i, j))
+        step = steps[offsets[i] + j - starts[i]]
+        if step == STEP_UP:
+            i -= 1
+        elif step == STEP_LEFT:
+            j -= 1
+        else:
+            i -= 1
+            j -= 1
     path.reverse()
-    return (D[len_x, len_y][0], path)
+    if len_x > 0 and starts[-1] < len_y == ends[-1]:
+        distance = float(cost[-1])
+    else:
+        distance = float("inf")
+    return (distance, path)
+
+
+def __band_slice(row, row_start, row_end, start, end):
+    """Get the values of a banded row in the columns [start, end).
+
+    The columns outside the band of the row are unreachable, so infinite.
+    """
+    out = np.full(end - start, np.inf)
+    lo, hi = max(start, row_start), min(end, row_end)
+    if lo < hi:
+        out[lo - start : hi - start] = row[lo - row_start : hi - row_start]
+    return out
+
+
+def __row_recurrence(up, diag, dt):
+    """Compute the accumulated cost of a row, given the vertical candidates.
+
+    Ties are broken in the order up, left, diag.
+    The vertical moves are resolved at once, the horizontal moves depend on
+    the previous cell in the same row: they are propagated with a few
+    vectorized passes, and with a plain loop if the runs are long.
+    """
+    vert = np.minimum(up, diag)
+    vert_steps = np.where(up <= diag, STEP_UP, STEP_DIAG).astype(np.uint8)
+
+    row = vert
+    for _ in range(MAX_LEFT_PASSES):
+        left = np.empty_like(row)
+        left[:1] = np.inf
+        left[1:] = row[:-1] + dt[1:]
+        new_row = np.minimum(vert, left)
+        if np.array_equal(new_row, row):
+            break
+        row = new_row
+    else:
+        row = __row_recurrence_loop(vert, dt)
+
+    left = np.empty_like(row)
+    left[:1] = np.inf
+    left[1:] = row[:-1] + dt[1:]
+    use_left = (left < vert) | ((left == vert) & (vert_steps == STEP_DIAG))
+    row_steps = np.where(use_left, STEP_LEFT, vert_steps).astype(np.uint8)
+    return row, row_steps
+
+
+def __row_recurrence_loop(vert, dt):
+    """Compute the accumulated cost of a row one cell at a time."""
+    row = vert.tolist()
+    dt_ls = dt.tolist()
+    for k in range(1, len(row)):
+        left = row[k - 1] + dt_ls[k]
+        if left < row[k]:
+            row[k] = left
+    return np.array(row, dtype=float)
 
 
 def __reduce_by_half(x):
     # return [(x[i] + x[1 + i]) / 2 for i in range(0, len(x) - len(x) % 2, 2)]
-    return [x[i] for i in range(0, len(x) - len(x) % 2, 2)]
+    # return [x[i] for i in range(0, len(x) - len(x) % 2, 2)]
+    return x[: len(x) - len(x) % 2 : 2]
 
 
 def __expand_window(path, len_x, len_y, radius):
-    path_ = set(path)
-    for i, j in path:
-        for a, b in (
-            (i + a, j + b)
-            for a in range(-radius, radius + 1)
-            for b in range(-radius, radius + 1)
-        ):
-            path_.add((a, b))
-
-    window_ = set()
-    for i, j in path_:
-        for a, b in (
-            (i * 2, j * 2),
-            (i * 2, j * 2 + 1),
-            (i * 2 + 1, j * 2),
-            (i * 2 + 1, j * 2 + 1),
-        ):
-            window_.add((a, b))
-
-    window = []
-    start_j = 0
-    for i in range(0, len_x):
-        new_start_j = None
-        for j in range(start_j, len_y):
-            if (i, j) in window_:
-                window.append((i, j))
-                if new_start_j is None:
-                    new_start_j = j
-            elif new_start_j is not None:
-                break
-        start_j = new_start_j
-
-    return window
+    """Expand a low resolution path into a banded window.
+
+    The path is monotonic, so the cells of each low resolution row form an
+    interval, and the square neighbourhood of radius around the path is, for
+    each row, the union of the intervals of the rows within radius, widened
+    by radius: as the intervals are sorted, that is just the first start and
+    the last end. The intervals are then upsampled by 2 in both directions.
+
+    Returns:
+        The window as a pair of arrays (starts, ends): row i spans the
+        columns [starts[i], ends[i]).
+    """
+    path = np.asarray(path)
+    rows, cols = path[:, 0], path[:, 1]
+    len_rows = rows[-1] + 1
+
+    # interval of each low resolution row
+    row_idx = np.arange(len_rows)
+    path_start = cols[np.searchsorted(rows, row_idx, side="left")]
+    path_end = cols[np.searchsorted(rows, row_idx, side="right") - 1]
+
+    # dilate by radius and upsample each high resolution row
+    low_row = np.arange(len_x) // 2
+    low_start = path_start[np.clip(low_row - radius, 0, len_rows - 1)] - radius
+    low_end = path_end[np.clip(low_row + radius, 0, len_rows - 1)] + radius
+    starts = np.clip(low_start * 2, 0, len_y)
+    ends = np.clip(low_end * 2 + 2, starts, len_y)
+
+    return starts, ends
@@ -0,0 +1,96 @@
+"""Evaluate a distance between frames on a process pool.
+
+Use it as the batch_dist of fastdtw.
+The frames are shared with the workers through shared memory once,
+each task only receives the indices of the cells to evaluate.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import os
+from typing import Any, Callable, Self, Sequence
+
+import numpy as np
+
+from climbing_wire.video.shared_frames import FrameLike, attach_frames, share_frames
+
+# the state of each worker process, set by _init_worker
+_worker_state: dict[str, Any] = {}
+
+
+def _init_worker(
+    dist: Callable[[Any, Any], float],
+    x_spec: dict[str, Any],
+    y_spec: dict[str, Any],
+) -> None:
+    """Attach the worker to the shared frames."""
+    x_shm, x = attach_frames(x_spec)
+    y_shm, y = attach_frames(y_spec)
+    _worker_state.update(dist=dist, x=x, y=y, shm=(x_shm, y_shm))
+
+
+def _eval_cells(ii: np.ndarray, jj: np.ndarray) -> np.ndarray:
+    """Evaluate the distance on a chunk of cells, in a worker."""
+    dist = _worker_state["dist"]
+    x = _worker_state["x"]
+    y = _worker_state["y"]
+    return np.fromiter(
+        (dist(x[i], y[j]) for i, j in zip(ii, jj)), dtype=float, count=len(ii)
+    )
+
+
+class ProcessPoolDistance:
+    """Evaluate dist(x[i], y[j]) on many cells using a process pool.
+
+    The dist function must be picklable, as it is sent once to each worker.
+    The frames of x and y are copied once in shared memory.
+    """
+
+    def __init__(
+        self,
+        dist: Callable[[Any, Any], float],
+        x: Sequence[FrameLike],
+        y: Sequence[FrameLike],
+        max_workers: int | None = None,
+        chunksize: int = 64,
+    ) -> None:
+        """Create the pool and share the frames.
+
+        Args:
+            dist: The distance between two frames.
+            x: The first sequence of frames.
+            y: The second sequence of frames.
+            max_workers: Number of worker processes. Defaults to the cpu count.
+            chunksize: Number of cells evaluated in each task.
+        """
+        self.chunksize = chunksize
+        self.x_shm, x_spec = share_frames(x)
+        self.y_shm, y_spec = share_frames(y)
+        self.executor = ProcessPoolExecutor(
+            max_workers=max_workers or os.cpu_count(),
+            initializer=_init_worker,
+            initargs=(dist, x_spec, y_spec),
+        )
+
+    def __call__(self, ii: np.ndarray, jj: np.ndarray) -> np.ndarray:
+        """Evaluate the distance between x[ii[k]] and y[jj[k]] for all k."""
+        if len(ii) == 0:
+            return np.empty(0, dtype=float)
+        bounds = range(0, len(ii), self.chunksize)
+        chunks_i = [ii[b : b + self.chunksize] for b in bounds]
+        chunks_j = [jj[b : b + self.chunksize] for b in bounds]
+        return np.concatenate(list(self.executor.map(_eval_cells, chunks_i, chunks_j)))
+
+    def close(self) -> None:
+        """Stop the workers and release the shared memory."""
+        self.executor.shutdown()
+        for shm in (self.x_shm, self.y_shm):
+            shm.close()
+            shm.unlink()
+
+    def __enter__(self) -> Self:
+        """Enter the context."""
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        """Exit the context."""
+        self.close()
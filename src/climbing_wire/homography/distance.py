@@ -0,0 +1,206 @@
+"""Distance between frames, based on the homography between them.
+
+The distance is the mean squared displacement of the corners of the first
+frame, when warped on the second one.
+The results can be stored in an on-disk cache, so that repeated or refined
+alignments of the same videos reuse the homographies already computed.
+"""
+
+from pathlib import Path
+import sqlite3
+from typing import Any, Self
+
+import numpy as np
+
+from climbing_wire.homography.homography import (
+    HomographyEstimator,
+    HomographyResult,
+    perspective_transform,
+)
+from climbing_wire.video.frame import Frame
+
+
+def image_corners(img_shape: tuple[int, ...]) -> np.ndarray:
+    """Get the corners of an image, as a (4, 2) float32 array."""
+    h, w = img_shape[:2]
+    return np.array([[0, 0], [w, 0], [w, h], [0, h]], dtype=np.float32)
+
+
+def corner_displacement(
+    M: np.ndarray,
+    img_shape: tuple[int, ...],
+) -> float:
+    """Mean squared displacement of the corners of an image warped with M."""
+    corners = image_corners(img_shape)
+    corners_warp = perspective_transform(corners, M)
+    corners_delta = corners_warp - corners
+    return float((corners_delta**2).mean())
+
+
+def failed_displacement(img_shape: tuple[int, ...]) -> float:
+    """Distance to use when the homography cannot be computed.
+
+    Assume that one image is completely outside the other.
+    """
+    h, w = img_shape[:2]
+    return float(((h + w) * 2) ** 2)
+
+
+class PairDistanceCache:
+    """Store the homography distance between pairs of frames in a sqlite file.
+
+    A pair is identified by the source of each frame, see video_frame_source,
+    the timestamp of each frame, and a config string describing how the homography was computed.
+    The connection is opened lazily, so the cache can be sent to other processes.
+    """
+
+    def __init__(self, db_path: Path) -> None:
+        """Create the PairDistanceCache.
+
+        Args:
+            db_path: The sqlite file, created if missing.
+        """
+        self.db_path = db_path
+        self._conn: sqlite3.Connection | None = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """The connection to the database, opened on first use."""
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, timeout=60, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS pair_dist ("
+                " fp1 TEXT, usec1 INTEGER, fp2 TEXT, usec2 INTEGER, config TEXT,"
+                " distance REAL, M BLOB, inliers INTEGER, matches INTEGER,"
+                " PRIMARY KEY (fp1, usec1, fp2, usec2, config))"
+            )
+        return self._conn
+
+    def get(
+        self,
+        key: tuple[str, int, str, int, str],
+    ) -> tuple[float, HomographyResult | None] | None:
+        """Get the distance and the homography of a pair.
+
+        Returns:
+            None if the pair is not in the cache, else the distance and the
+            homography result, which is None if the homography failed.
+        """
+        row = self.conn.execute(
+            "SELECT distance, M, inliers, matches FROM pair_dist"
+            " WHERE fp1=? AND usec1=? AND fp2=? AND usec2=? AND config=?",
+            key,
+        ).fetchone()
+        if row is None:
+            return None
+        distance, M_blob, inliers, matches = row
+        if M_blob is None:
+            return distance, None
+        M = np.frombuffer(M_blob, dtype=np.float64).reshape(3, 3).copy()
+        return distance, HomographyResult(M, inliers, matches)
+
+    def put(
+        self,
+        key: tuple[str, int, str, int, str],
+        distance: float,
+        result: HomographyResult | None,
+    ) -> None:
+        """Store the distance and the homography of a pair."""
+        if result is None:
+            values = (distance, None, 0, 0)
+        else:
+            M_blob = np.ascontiguousarray(result.M, dtype=np.float64).tobytes()
+            values = (distance, M_blob, result.inliers, result.matches)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO pair_dist VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (*key, *values),
+        )
+
+    def __len__(self) -> int:
+        """Return the number of pairs in the cache."""
+        return self.conn.execute("SELECT COUNT(*) FROM pair_dist").fetchone()[0]
+
+    def close(self) -> None:
+        """Close the connection."""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def __getstate__(self) -> dict[str, Any]:
+        """Get the state to pickle, without the connection."""
+        return {"db_path": self.db_path, "_conn": None}
+
+    def __enter__(self) -> Self:
+        """Enter the context."""
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        """Exit the context."""
+        self.close()
+
+
+class HomographyDistance:
+    """Distance between two frames, from the homography between them.
+
+    Use it as the dist of fastdtw, with the frames of x from one video and
+    the frames of y from another one.
+    The frames are identified by their source and timestamp, in the cache and
+    in the feature cache of the estimator, so they must have a source.
+    """
+
+    def __init__(
+        self,
+        estimator: HomographyEstimator | None = None,
+        cache: PairDistanceCache | None = None,
+    ) -> None:
+        """Create the HomographyDistance.
+
+        Args:
+            estimator: The estimator to compute the homographies.
+                Defaults to one working on images at half resolution.
+            cache: Optional on-disk cache of the distances.
+        """
+        if estimator is None:
+            estimator = HomographyEstimator(scale=0.5)
+        self.estimator = estimator
+        self.cache = cache
+        self.config = (
+            f"scale={estimator.scale},ratio={estimator.ratio_thresh},"
+            f"min_match={estimator.min_match_count},ransac={estimator.ransac_thresh}"
+        )
+
+    def compute(self, f1: Frame, f2: Frame) -> tuple[float, HomographyResult | None]:
+        """Compute the distance and the homography between two frames.
+
+        Returns:
+            The distance, and the homography result or None if it failed.
+
+        Raises:
+            ValueError: If a frame has no source.
+        """
+        if f1.source is None or f2.source is None:
+            raise ValueError("The frames need a source to identify them")
+        key = (f1.source, f1.usec, f2.source, f2.usec, self.config)
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        try:
+            result = self.estimator.estimate_frames(f1, f2, key[:2], key[2:4])
+        except ValueError:
+            result = None
+        if result is None:
+            distance = failed_displacement(f1.frame.shape)
+        else:
+            distance = corner_displacement(result.M, f1.frame.shape)
+
+        if self.cache is not None:
+            self.cache.put(key, distance, result)
+        return distance, result
+
+    def __call__(self, f1: Frame, f2: Frame) -> float:
+        """Compute the distance between two frames."""
+        return self.compute(f1, f2)[0]
@@ -4,21 +4,131 @@ https://docs.opencv.org/3.4/d1/de0/tutorial_py_feature_homography.html
 """
 
 
+from collections import OrderedDict
+from dataclasses import dataclass
 import math
 import pathlib
+from typing import Any, Callable, Hashable
 
 import cv2 as cv
 import matplotlib.pyplot as plt
-import mediapipe as mp
 import numpy as np
 from matplotlib import pyplot as plt
 
+from climbing_wire.video.frame import Frame
+
+
+FLANN_INDEX_KDTREE = 1
+
+
+@dataclass
+class ImgFeatures:
+    """Keypoints and descriptors of an image.
+
+    The keypoints are stored as a (N, 2) float32 array of positions,
+    rather than as cv.KeyPoint objects, as only the position is needed.
+    """
+
+    pts: np.ndarray
+    des: np.ndarray | None
+
+    def __len__(self) -> int:
+        """Return the number of keypoints."""
+        return len(self.pts)
+
+
+@dataclass
+class HomographyResult:
+    """A homography, with the number of good matches and RANSAC inliers."""
+
+    M: np.ndarray
+    inliers: int
+    matches: int
+
+    @property
+    def inlier_ratio(self) -> float:
+        """Fraction of the good matches that are RANSAC inliers."""
+        return self.inliers / self.matches if self.matches > 0 else 0.0
+
+
+def keypoints_to_array(kp: tuple[cv.KeyPoint, ...]) -> np.ndarray:
+    """Get the positions of the keypoints as a (N, 2) float32 array."""
+    return np.array(cv.KeyPoint_convert(kp), dtype=np.float32).reshape(-1, 2)
+
+
+def create_flann_matcher() -> cv.FlannBasedMatcher:
+    """Create the FLANN matcher used to match SIFT descriptors."""
+    index_params = dict(algorithm=FLANN_INDEX_KDTREE, trees=5)
+    search_params = dict(checks=50)
+    return cv.FlannBasedMatcher(index_params, search_params)
+
+
+def match_features(
+    feat1: ImgFeatures,
+    feat2: ImgFeatures,
+    flann: cv.FlannBasedMatcher,
+    ratio_thresh: float = 0.7,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Match the descriptors of two images, filtered with Lowe's ratio test.
+
+    Returns:
+        The source and destination points of the good matches,
+        as two (N, 1, 2) float32 arrays.
+    """
+    if feat1.des is None or feat2.des is None or len(feat1) < 2 or len(feat2) < 2:
+        empty = np.empty((0, 1, 2), dtype=np.float32)
+        return empty, empty
+    matches = flann.knnMatch(feat1.des, feat2.des, k=2)
+
+    # store all the good matches as per Lowe's ratio test.
+    query_idx: list[int] = []
+    train_idx: list[int] = []
+    for pair in matches:
+        if len(pair) < 2:
+            continue
+        m, n = pair
+        if m.distance < ratio_thresh * n.distance:
+            query_idx.append(m.queryIdx)
+            train_idx.append(m.trainIdx)
+
+    src_pts = feat1.pts[query_idx].reshape(-1, 1, 2)
+    dst_pts = feat2.pts[train_idx].reshape(-1, 1, 2)
+    return src_pts, dst_pts
+
+
+def fit_homography(
+    src_pts: np.ndarray,
+    dst_pts: np.ndarray,
+    min_match_count: int = 10,
+    ransac_thresh: float = 5.0,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Fit a homography with RANSAC on matching points.
+
+    Returns:
+        The homography matrix and the inlier mask.
+
+    Raises:
+        ValueError: If there are not enough matches.
+    """
+    if len(src_pts) <= min_match_count:
+        # might be the time to whip out LoFTR
+        raise ValueError("Not enough matches found.")
+    # compute the homography with ransac
+    M, mask = cv.findHomography(src_pts, dst_pts, cv.RANSAC, ransac_thresh)
+    if M is None:
+        raise ValueError("Homography estimation failed.")
+    return M, mask
+
 
 def compute_homography(
     img1: np.ndarray,
     img2: np.ndarray,
 ) -> np.ndarray:
-    """Compute the homography matrix between two images."""
+    """Compute the homography matrix between two images.
+
+    Creates a new detector and matcher every time:
+    use a HomographyEstimator to compute many homographies.
+    """
     # convert to grayscale
     img1 = cv.cvtColor(img1, cv.COLOR_BGR2GRAY)
     img2 = cv.cvtColor(img2, cv.COLOR_BGR2GRAY)
@@ -29,37 +139,202 @@ def compute_homography(
     # find the keypoints and descriptors with SIFT
     kp1, des1 = sift.detectAndCompute(img1, None)
     kp2, des2 = sift.detectAndCompute(img2, None)
+    feat1 = ImgFeatures(keypoints_to_array(kp1), des1)
+    feat2 = ImgFeatures(keypoints_to_array(kp2), des2)
 
     # set up the matcher and match
-    FLANN_INDEX_KDTREE = 1
-    index_params = dict(algorithm=FLANN_INDEX_KDTREE, trees=5)
-    search_params = dict(checks=50)
-    flann = cv.FlannBasedMatcher(index_params, search_params)
-    matches = flann.knnMatch(des1, des2, k=2)
-
-    # store all the good matches as per Lowe's ratio test.
-    good = []
-    for m, n in matches:
-        if m.distance < 0.7 * n.distance:
-            good.append(m)
+    flann = create_flann_matcher()
+    src_pts, dst_pts = match_features(feat1, feat2, flann)
 
     # compute the homography
-    MIN_MATCH_COUNT = 10
-    if len(good) > MIN_MATCH_COUNT:
-        # get the points that are good matches
-        src_pts_ls = [kp1[m.queryIdx].pt for m in good]
-        src_pts = np.array(src_pts_ls, dtype=np.float32).reshape(-1, 1, 2)
-        dst_pts_ls = [kp2[m.trainIdx].pt for m in good]
-        dst_pts = np.array(dst_pts_ls, dtype=np.float32).reshape(-1, 1, 2)
-        # compute the homography with ransac
-        M, mask = cv.findHomography(src_pts, dst_pts, cv.RANSAC, 5.0)
-    else:
-        # might be the time to whip out LoFTR
-        raise ValueError("Not enough matches found.")
-
+    M, _ = fit_homography(src_pts, dst_pts)
     return M
 
 
+def default_frame_key(frame: Frame) -> Hashable:
+    """Key used to cache the features of a frame.
+
+    Raises:
+        ValueError: If the frame has no source, as frames from different
+            videos would share the same key.
+    """
+    if frame.source is None:
+        raise ValueError(
+            f"Cannot build a cache key for {frame} without a source:"
+            " set the frame source, or pass explicit keys."
+        )
+    return (frame.source, frame.idx, frame.usec)
+
+
+class HomographyEstimator:
+    """Compute homographies between images, reusing detector and matcher.
+
+    The features of each frame are cached in a bounded LRU,
+    so that a frame compared against many others is processed only once.
+
+    The default frame key is (source, idx, usec), so frames from different
+    videos never share features. Frames without a source need a custom
+    frame_key, or explicit keys to compute_frames.
+    """
+
+    def __init__(
+        self,
+        cache_size: int = 256,
+        scale: float = 1.0,
+        ratio_thresh: float = 0.7,
+        min_match_count: int = 10,
+        ransac_thresh: float = 5.0,
+        frame_key: Callable[[Frame], Hashable] = default_frame_key,
+    ) -> None:
+        """Create the HomographyEstimator.
+
+        Args:
+            cache_size: Maximum number of frames to keep features for.
+            scale: Resize the images by this factor before extracting features.
+                The keypoints are scaled back, so the homographies are always
+                in the coordinates of the original images.
+            ratio_thresh: Threshold for Lowe's ratio test.
+            min_match_count: Minimum number of good matches to fit a homography.
+            ransac_thresh: Maximum reprojection error for a RANSAC inlier.
+            frame_key: Function to build the cache key of a frame.
+        """
+        self.cache_size = cache_size
+        self.scale = scale
+        self.ratio_thresh = ratio_thresh
+        self.min_match_count = min_match_count
+        self.ransac_thresh = ransac_thresh
+        self.frame_key = frame_key
+
+        self.sift = cv.SIFT_create()
+        self.flann = create_flann_matcher()
+        self.cache: OrderedDict[Hashable, ImgFeatures] = OrderedDict()
+
+    def compute_features(self, img: np.ndarray) -> ImgFeatures:
+        """Extract the keypoints and descriptors of a BGR or grayscale image."""
+        if img.ndim == 3:
+            img = cv.cvtColor(img, cv.COLOR_BGR2GRAY)
+        if self.scale != 1.0:
+            img = cv.resize(
+                img, (0, 0), fx=self.scale, fy=self.scale, interpolation=cv.INTER_AREA
+            )
+        kp, des = self.sift.detectAndCompute(img, None)
+        pts = keypoints_to_array(kp)
+        if self.scale != 1.0:
+            pts /= self.scale
+        return ImgFeatures(pts, des)
+
+    def get_features(self, img: np.ndarray, key: Hashable) -> ImgFeatures:
+        """Get the features of an image, from the cache if available."""
+        feat = self.cache.get(key)
+        if feat is not None:
+            self.cache.move_to_end(key)
+            return feat
+        feat = self.compute_features(img)
+        self.cache[key] = feat
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return feat
+
+    def homography_from_features(
+        self,
+        feat1: ImgFeatures,
+        feat2: ImgFeatures,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Match two sets of features and fit the homography.
+
+        Returns:
+            The homography matrix and the inlier mask.
+        """
+        src_pts, dst_pts = match_features(feat1, feat2, self.flann, self.ratio_thresh)
+        return fit_homography(
+            src_pts, dst_pts, self.min_match_count, self.ransac_thresh
+        )
+
+    def estimate(
+        self,
+        img1: np.ndarray,
+        img2: np.ndarray,
+        key1: Hashable | None = None,
+        key2: Hashable | None = None,
+    ) -> HomographyResult:
+        """Compute the homography between two images, with the match stats.
+
+        If a key is None, the features for that image are not cached.
+        """
+        if key1 is None:
+            feat1 = self.compute_features(img1)
+        else:
+            feat1 = self.get_features(img1, key1)
+        if key2 is None:
+            feat2 = self.compute_features(img2)
+        else:
+            feat2 = self.get_features(img2, key2)
+        M, mask = self.homography_from_features(feat1, feat2)
+        return HomographyResult(M, int(mask.sum()), len(mask))
+
+    def estimate_frames(
+        self,
+        f1: Frame,
+        f2: Frame,
+        key1: Hashable | None = None,
+        key2: Hashable | None = None,
+    ) -> HomographyResult:
+        """Compute the homography between two frames, with the match stats.
+
+        Use the frame_key to cache the features if no explicit key is given.
+        """
+        key1 = self.frame_key(f1) if key1 is None else key1
+        key2 = self.frame_key(f2) if key2 is None else key2
+        return self.estimate(f1.frame, f2.frame, key1, key2)
+
+    def __call__(
+        self,
+        img1: np.ndarray,
+        img2: np.ndarray,
+        key1: Hashable | None = None,
+        key2: Hashable | None = None,
+    ) -> np.ndarray:
+        """Compute the homography matrix between two images.
+
+        If a key is None, the features for that image are not cached.
+        """
+        return self.estimate(img1, img2, key1, key2).M
+
+    def compute_frames(
+        self,
+        f1: Frame,
+        f2: Frame,
+        key1: Hashable | None = None,
+        key2: Hashable | None = None,
+    ) -> np.ndarray:
+        """Compute the homography matrix between two frames.
+
+        Use the frame_key to cache the features if no explicit key is given.
+        """
+        return self.estimate_frames(f1, f2, key1, key2).M
+
+    def clear_cache(self) -> None:
+        """Drop all the cached features."""
+        self.cache.clear()
+
+    def __getstate__(self) -> dict[str, Any]:
+        """Get the state to pickle, without the OpenCV objects and the cache.
+
+        This lets the estimator be sent to worker processes.
+        """
+        state = self.__dict__.copy()
+        for key in ("sift", "flann", "cache"):
+            del state[key]
+        return state
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        """Restore the state, creating new detector, matcher and cache."""
+        self.__dict__.update(state)
+        self.sift = cv.SIFT_create()
+        self.flann = create_flann_matcher()
+        self.cache = OrderedDict()
+
+
 def perspective_transform(points: np.ndarray, M: np.ndarray) -> np.ndarray:
     """Transform a set of points using a given 3x3 transformation matrix.
 
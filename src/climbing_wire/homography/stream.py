@@ -0,0 +1,334 @@
+"""Compute homographies along a stream of frames.
+
+Each frame is converted to grayscale and feature-extracted exactly once,
+the features of the previous frame are carried forward to the next pair.
+
+A motion model is called with the frames in order, and returns the homography
+from the previous frame to the current one (None for the first frame).
+It raises a ValueError if the homography cannot be computed,
+and the frame still becomes the previous frame.
+"""
+
+from typing import Callable, Generator, Iterable
+
+import cv2 as cv
+from loguru import logger as lg
+import numpy as np
+
+from climbing_wire.homography.distance import image_corners
+from climbing_wire.homography.homography import (
+    HomographyEstimator,
+    ImgFeatures,
+    perspective_transform,
+)
+
+MotionModel = Callable[[np.ndarray], np.ndarray | None]
+
+
+class StreamHomography:
+    """Compute the homography from the previous frame to the current one.
+
+    Call it with the frames in order.
+    """
+
+    def __init__(
+        self,
+        estimator: HomographyEstimator | None = None,
+    ) -> None:
+        """Create the StreamHomography.
+
+        Args:
+            estimator: The estimator used to extract and match the features.
+                Defaults to a new HomographyEstimator.
+        """
+        self.estimator = estimator if estimator is not None else HomographyEstimator()
+        self.prev_feat: ImgFeatures | None = None
+
+    def __call__(self, img: np.ndarray) -> np.ndarray | None:
+        """Add a frame to the stream.
+
+        Returns:
+            The homography from the previous frame to this one,
+            or None for the first frame.
+
+        Raises:
+            ValueError: If the homography cannot be computed.
+                The frame still becomes the previous frame of the stream.
+        """
+        feat = self.estimator.compute_features(img)
+        prev_feat = self.prev_feat
+        self.prev_feat = feat
+        if prev_feat is None:
+            return None
+        M, _ = self.estimator.homography_from_features(prev_feat, feat)
+        return M
+
+    def reset(self) -> None:
+        """Forget the previous frame."""
+        self.prev_feat = None
+
+
+def overlap_ratio(
+    M: np.ndarray,
+    img_shape: tuple[int, ...],
+) -> float:
+    """Fraction of an image covered by the same image warped with M."""
+    corners = image_corners(img_shape)
+    corners_warp = perspective_transform(corners, M).astype(np.float32)
+    area, _ = cv.intersectConvexConvex(corners_warp, corners)
+    return float(area) / (img_shape[0] * img_shape[1])
+
+
+class KeyframeHomography:
+    """Compute the homography from the previous frame, through a keyframe.
+
+    Each frame is registered against the current keyframe, and the homography
+    from the previous frame comes from the cached homography from the keyframe
+    to the previous frame. This keeps the chain of homographies short, so the
+    errors accumulate only when a new keyframe is promoted: that happens when
+    the inlier ratio or the overlap with the keyframe drop below a threshold.
+    """
+
+    def __init__(
+        self,
+        estimator: HomographyEstimator | None = None,
+        min_inlier_ratio: float = 0.5,
+        min_overlap: float = 0.7,
+    ) -> None:
+        """Create the KeyframeHomography.
+
+        Args:
+            estimator: The estimator used to extract and match the features.
+                Defaults to a new HomographyEstimator.
+            min_inlier_ratio: Promote a new keyframe when the fraction of
+                RANSAC inliers against the keyframe drops below this.
+            min_overlap: Promote a new keyframe when the fraction of the frame
+                covered by the warped keyframe drops below this.
+        """
+        self.estimator = estimator if estimator is not None else HomographyEstimator()
+        self.min_inlier_ratio = min_inlier_ratio
+        self.min_overlap = min_overlap
+
+        self.kf_feat: ImgFeatures | None = None
+        self.prev_feat: ImgFeatures | None = None
+        # homography from the keyframe to the previous frame
+        self.M_kf_prev = np.eye(3)
+        self.keyframe_count = 0
+
+    def __call__(self, img: np.ndarray) -> np.ndarray | None:
+        """Add a frame to the stream.
+
+        Returns:
+            The homography from the previous frame to this one,
+            or None for the first frame.
+
+        Raises:
+            ValueError: If the frame cannot be registered against the keyframe,
+                nor against the previous frame. The frame still becomes
+                the keyframe and the previous frame of the stream.
+        """
+        feat = self.estimator.compute_features(img)
+        if self.kf_feat is None or self.prev_feat is None:
+            self._promote(feat)
+            return None
+
+        try:
+            M_kf_cur, mask = self.estimator.homography_from_features(self.kf_feat, feat)
+        except ValueError:
+            # the keyframe is too far, register against the previous frame
+            try:
+                M, _ = self.estimator.homography_from_features(self.prev_feat, feat)
+            finally:
+                # the frame becomes the previous frame even if both failed
+                self._promote(feat)
+            return M
+
+        M = M_kf_cur @ np.linalg.inv(self.M_kf_prev)
+        M /= M[2, 2]
+        inlier_ratio = mask.sum() / len(mask)
+        if (
+            inlier_ratio < self.min_inlier_ratio
+            or overlap_ratio(M_kf_cur, img.shape) < self.min_overlap
+        ):
+            self._promote(feat)
+        else:
+            self.M_kf_prev = M_kf_cur
+            self.prev_feat = feat
+        return M
+
+    def _promote(self, feat: ImgFeatures) -> None:
+        """Make the current frame the new keyframe."""
+        self.kf_feat = feat
+        self.prev_feat = feat
+        self.M_kf_prev = np.eye(3)
+        self.keyframe_count += 1
+
+    def reset(self) -> None:
+        """Forget the keyframe and the previous frame."""
+        self.kf_feat = None
+        self.prev_feat = None
+        self.M_kf_prev = np.eye(3)
+
+
+class KltHomography:
+    """Compute the homography from the previous frame with optical flow.
+
+    The good points of the previous frame are tracked with pyramidal
+    Lucas-Kanade, and the homography is fitted on those correspondences.
+    If too few points survive, or the inlier ratio collapses, fall back to
+    SIFT matching. If that fails too, raise a ValueError.
+    The SIFT features of the current frame are carried forward, so consecutive
+    fallbacks extract them once per frame.
+    """
+
+    def __init__(
+        self,
+        estimator: HomographyEstimator | None = None,
+        min_points: int = 40,
+        min_inlier_ratio: float = 0.5,
+        max_corners: int = 400,
+        refill_points: int = 150,
+        ransac_thresh: float = 3.0,
+        win_size: int = 21,
+        max_level: int = 3,
+    ) -> None:
+        """Create the KltHomography.
+
+        Args:
+            estimator: The estimator used for the SIFT fallback.
+                Defaults to a new HomographyEstimator.
+            min_points: Minimum number of tracked points to fit the homography.
+            min_inlier_ratio: Fall back to SIFT when the fraction of RANSAC
+                inliers among the tracked points drops below this.
+            max_corners: Number of corners to detect when refilling the points.
+            refill_points: Detect new corners when fewer points are left.
+            ransac_thresh: Maximum reprojection error for a RANSAC inlier.
+            win_size: Size of the search window at each pyramid level.
+            max_level: Number of pyramid levels.
+        """
+        self.estimator = estimator if estimator is not None else HomographyEstimator()
+        self.min_points = min_points
+        self.min_inlier_ratio = min_inlier_ratio
+        self.max_corners = max_corners
+        self.refill_points = refill_points
+        self.ransac_thresh = ransac_thresh
+        self.lk_params = dict(
+            winSize=(win_size, win_size),
+            maxLevel=max_level,
+            criteria=(cv.TERM_CRITERIA_EPS | cv.TERM_CRITERIA_COUNT, 30, 0.01),
+        )
+
+        self.prev_gray: np.ndarray | None = None
+        self.prev_pts = np.empty((0, 1, 2), dtype=np.float32)
+        # SIFT features of the previous frame, if it used the fallback
+        self.prev_feat: ImgFeatures | None = None
+        self.fallback_count = 0
+
+    def __call__(self, img: np.ndarray) -> np.ndarray | None:
+        """Add a frame to the stream.
+
+        Returns:
+            The homography from the previous frame to this one,
+            or None for the first frame.
+
+        Raises:
+            ValueError: If neither the tracked points nor the SIFT matches
+                give a homography. The frame still becomes the previous frame.
+        """
+        gray = cv.cvtColor(img, cv.COLOR_BGR2GRAY) if img.ndim == 3 else img
+        prev_gray = self.prev_gray
+        self.prev_gray = gray
+        prev_feat = self.prev_feat
+        self.prev_feat = None
+        if prev_gray is None:
+            self.prev_pts = self._detect(gray)
+            return None
+
+        M, pts = self._track(prev_gray, gray)
+        if len(pts) < self.refill_points:
+            pts = self._detect(gray)
+        self.prev_pts = pts
+        if M is None:
+            self.fallback_count += 1
+            if prev_feat is None:
+                prev_feat = self.estimator.compute_features(prev_gray)
+            feat = self.estimator.compute_features(gray)
+            self.prev_feat = feat
+            M, _ = self.estimator.homography_from_features(prev_feat, feat)
+        return M
+
+    def _track(
+        self,
+        prev_gray: np.ndarray,
+        gray: np.ndarray,
+    ) -> tuple[np.ndarray | None, np.ndarray]:
+        """Track the previous points and fit the homography on them.
+
+        Returns:
+            The homography, or None if the tracking was not good enough,
+            and the inlier points in the current frame.
+        """
+        no_pts = np.empty((0, 1, 2), dtype=np.float32)
+        if len(self.prev_pts) < self.min_points:
+            return None, no_pts
+        pts, status, _ = cv.calcOpticalFlowPyrLK(
+            prev_gray, gray, self.prev_pts, None, **self.lk_params
+        )
+        ok = status.ravel() == 1
+        src_pts, dst_pts = self.prev_pts[ok], pts[ok]
+        if len(src_pts) < self.min_points:
+            return None, no_pts
+        M, mask = cv.findHomography(src_pts, dst_pts, cv.RANSAC, self.ransac_thresh)
+        if M is None or mask.mean() < self.min_inlier_ratio:
+            return None, no_pts
+        return M, dst_pts[mask.ravel() == 1]
+
+    def _detect(self, gray: np.ndarray) -> np.ndarray:
+        """Detect new corners to track."""
+        pts = cv.goodFeaturesToTrack(
+            gray, maxCorners=self.max_corners, qualityLevel=0.01, minDistance=10
+        )
+        if pts is None:
+            return np.empty((0, 1, 2), dtype=np.float32)
+        return pts.astype(np.float32)
+
+    def reset(self) -> None:
+        """Forget the previous frame."""
+        self.prev_gray = None
+        self.prev_pts = np.empty((0, 1, 2), dtype=np.float32)
+        self.prev_feat = None
+
+
+def iterate_frame_homographies(
+    frames: Iterable[np.ndarray],
+    motion: MotionModel | None = None,
+) -> Generator[tuple[np.ndarray, np.ndarray | None], None, None]:
+    """Yield each frame with the homography from the previous frame.
+
+    Drop-in replacement for computing the homography on pairwise_video_frames:
+    the first frame is only used as reference, and is not yielded.
+    A frame whose homography cannot be computed is yielded with None,
+    and is still the reference for the next frame.
+
+    Args:
+        frames: The frames, in order.
+        motion: The stateful motion model, e.g. a StreamHomography,
+            a KeyframeHomography or a KltHomography.
+            Defaults to a new StreamHomography.
+
+    Yields:
+        The frame and the homography from the previous frame to it,
+        None if it failed.
+    """
+    if motion is None:
+        motion = StreamHomography()
+    for frame in frames:
+        try:
+            M = motion(frame)
+        except ValueError as exc:
+            lg.warning(f"Homography failed: {exc}")
+            yield frame, None
+            continue
+        if M is None:
+            continue
+        yield frame, M
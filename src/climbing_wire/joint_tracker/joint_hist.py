@@ -3,6 +3,8 @@
 A joint might be a landmark or the mean of multiple landmarks.
 """
 
+from dataclasses import dataclass
+from functools import cached_property
 from typing import Self
 
 from loguru import logger as lg
@@ -13,19 +15,126 @@ from climbing_wire.landmark.landmark_list import LandmarkListImg
 from climbing_wire.utils.mediapipe import JOINT_NAMES_TYPE
 
 
+def advance_anchor(
+    C: np.ndarray,
+    M: np.ndarray,
+    img_shape: tuple[int, ...],
+    max_anchor_cond: float,
+) -> tuple[np.ndarray, np.ndarray, bool]:
+    """Move the cumulative homography from the anchor forward to a new frame.
+
+    The conditioning is measured with the pixel coordinates scaled by the
+    frame size, so that a plain pan only triggers a rebase after moving
+    by many frames, and in the 1-norm, reusing the inverse needed to bring
+    the new positions back to the anchor frame, so that no SVD is needed.
+
+    Args:
+        C: The homography from the anchor frame to the previous frame.
+        M: The homography from the previous frame to the new one.
+        img_shape: Size of the frames.
+        max_anchor_cond: Maximum condition number of the normalized
+            cumulative homography.
+
+    Returns:
+        The homography from the anchor to the new frame, its inverse,
+        and whether the anchor should be moved to the new frame.
+    """
+    C = M @ C
+    C /= C[2, 2]
+    C_inv = np.linalg.inv(C)
+    # scale the coordinates so that the frame size is 1
+    size = max(img_shape[:2])
+    n = np.array([1 / size, 1 / size, 1])
+    scale = n[:, None] / n[None, :]
+    cond = np.linalg.norm(C * scale, 1) * np.linalg.norm(C_inv * scale, 1)
+    return C, C_inv, bool(cond > max_anchor_cond)
+
+
 class JointHist:
-    """Track the history of a joint across multiple frames."""
+    """Track the history of a joint across multiple frames.
+
+    Each position is stored once, in the coordinates of an anchor frame,
+    along with the cumulative homography from the anchor to the current frame.
+    The track is reprojected in the current frame only when it is read,
+    so adding a frame costs the same no matter how long the history is.
+
+    The history is stored in preallocated buffers that double in size when
+    full, so that adding a frame is amortized O(1).
+    """
 
     def __init__(
         self,
         which_joint: JOINT_NAMES_TYPE,
+        capacity: int = 256,
+        max_anchor_cond: float = 1e4,
     ) -> None:
-        """Create the JointHist."""
+        """Create the JointHist.
+
+        Args:
+            which_joint: The joint to track.
+            capacity: Number of frames to preallocate.
+            max_anchor_cond: When the condition number of the cumulative
+                homography, in frame-size units, grows above this,
+                the current frame becomes the new anchor, to avoid losing
+                precision. See advance_anchor.
+        """
         self.which_joint: JOINT_NAMES_TYPE = which_joint
+        self.max_anchor_cond = max_anchor_cond
 
         # prepare the joint hist data
-        self.track = np.empty((0, 2), float)
-        self.visibility = np.empty((0,), float)
+        self._anchor_buf = np.empty((max(capacity, 1), 2), float)
+        self._visibility_buf = np.empty((max(capacity, 1),), float)
+        self._len = 0
+
+        # homography from the anchor frame to the current frame
+        self.C = np.eye(3)
+        # track in the current frame, computed when needed
+        self._track: np.ndarray | None = None
+
+    @property
+    def anchor_track(self) -> np.ndarray:
+        """The joint positions in the anchor frame, as a (N, 2) view."""
+        return self._anchor_buf[: self._len]
+
+    @property
+    def track(self) -> np.ndarray:
+        """The joint positions in the current frame, as a (N, 2) array."""
+        if self._track is None:
+            self._track = perspective_transform(self.anchor_track, self.C)
+        return self._track
+
+    @property
+    def visibility(self) -> np.ndarray:
+        """The visibility of the joint in each frame, as a (N,) view."""
+        return self._visibility_buf[: self._len]
+
+    @property
+    def capacity(self) -> int:
+        """Number of frames that fit in the buffers."""
+        return len(self._anchor_buf)
+
+    def _reserve(self, size: int) -> None:
+        """Grow the buffers, doubling them, to hold at least size frames."""
+        if size <= self.capacity:
+            return
+        new_capacity = max(size, 2 * self.capacity)
+        anchor_buf = np.empty((new_capacity, 2), float)
+        anchor_buf[: self._len] = self.anchor_track
+        visibility_buf = np.empty((new_capacity,), float)
+        visibility_buf[: self._len] = self.visibility
+        self._anchor_buf = anchor_buf
+        self._visibility_buf = visibility_buf
+
+    def _rebase(self) -> None:
+        """Move the anchor to the current frame.
+
+        The positions are written in a new buffer, as the stored ones
+        might be shared with snapshots.
+        """
+        anchor_buf = np.empty_like(self._anchor_buf)
+        anchor_buf[: self._len] = self.track
+        self._anchor_buf = anchor_buf
+        self.C = np.eye(3)
 
     def add_frame(
         self,
@@ -34,24 +143,80 @@ class JointHist:
     ) -> None:
         """Add a new frame to the history.
 
-        Appending to a numpy array is slow, TODO.
+        Args:
+            landlist: The landmarks in the new frame.
+            M: The homography from the previous frame to the new one.
         """
-        # warp the old joint positions to the new frame
-        self.track = perspective_transform(self.track, M)
+        # move the current frame forward
+        self.C, C_inv, rebase = advance_anchor(
+            self.C, M, landlist.img_shape, self.max_anchor_cond
+        )
+        self._track = None
+        if rebase:
+            self._rebase()
+            C_inv = np.eye(3)
 
-        # get the new joint position
+        # get the new joint position, and bring it back to the anchor frame
         lm, viz = landlist.get_landmark_for_joint(self.which_joint)
-        self.track = np.append(self.track, lm, axis=0)
-        self.visibility = np.append(self.visibility, viz)
+        lm_anchor = perspective_transform(lm.astype(float), C_inv)
+        self._reserve(self._len + 1)
+        self._anchor_buf[self._len] = lm_anchor[0]
+        self._visibility_buf[self._len] = viz
+        self._len += 1
+
+    def clear(self) -> None:
+        """Drop the history, the next frame becomes the anchor.
+
+        New buffers are allocated, as the stored ones might be shared
+        with snapshots.
+        """
+        self._anchor_buf = np.empty_like(self._anchor_buf)
+        self._visibility_buf = np.empty_like(self._visibility_buf)
+        self._len = 0
+        self.C = np.eye(3)
+        self._track = None
 
     def __len__(self) -> int:
         """Return the number of frames in the history."""
-        return len(self.track)
+        return self._len
+
+    def snapshot(self) -> "JointHistSnapshot":
+        """Return an immutable view of the current history, in O(1).
+
+        The buffers are append-only, so the snapshot shares them.
+        """
+        return JointHistSnapshot(
+            self.which_joint, self.anchor_track, self.visibility, self.C.copy()
+        )
 
     def copy(self) -> Self:
         """Return a copy of the JointHist."""
         # lg.debug("Copying JointHist.")
-        jh = JointHist(self.which_joint)
-        jh.track = self.track.copy()
-        jh.visibility = self.visibility.copy()
+        jh = JointHist(self.which_joint, self.capacity, self.max_anchor_cond)
+        jh._anchor_buf[: self._len] = self.anchor_track
+        jh._visibility_buf[: self._len] = self.visibility
+        jh._len = self._len
+        jh.C = self.C.copy()
         return jh
+
+
+@dataclass(frozen=True)
+class JointHistSnapshot:
+    """An immutable view of the history of a joint at a given frame.
+
+    The positions are reprojected in the frame of the snapshot when read.
+    """
+
+    which_joint: JOINT_NAMES_TYPE
+    anchor_track: np.ndarray
+    visibility: np.ndarray
+    C: np.ndarray
+
+    @cached_property
+    def track(self) -> np.ndarray:
+        """The joint positions in the frame of the snapshot, as a (N, 2) array."""
+        return perspective_transform(self.anchor_track, self.C)
+
+    def __len__(self) -> int:
+        """Return the number of frames in the history."""
+        return len(self.anchor_track)
@@ -4,39 +4,98 @@ A joint might be a landmark or the mean of multiple landmarks.
 """
 
 
-from typing import Any, Self
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Literal, Self
 
 from loguru import logger as lg
 import numpy as np
 
 from climbing_wire.homography.homography import compute_homography
-from climbing_wire.joint_tracker.joint_hist import JointHist
-from climbing_wire.landmark.compute import PoseImg
+from climbing_wire.homography.stream import (
+    KeyframeHomography,
+    KltHomography,
+    MotionModel,
+    StreamHomography,
+)
+from climbing_wire.joint_tracker.joint_hist import JointHist, JointHistSnapshot
+from climbing_wire.joint_tracker.joint_tracks import JointTracks, JointTrackView
 from climbing_wire.landmark.landmark_list import LandmarkListImg
 from climbing_wire.utils.mediapipe import JOINT_NAMES, JOINT_NAMES_TYPE
 
+if TYPE_CHECKING:
+    from climbing_wire.landmark.compute import PoseImg
+
 
 class JointTracker:
     """JointTracker tracks the joints of a person in a video stream.
 
     Track the history of several joints across multiple frames.
+
+    With the "hist" storage each joint has its own JointHist,
+    with the "stacked" storage all the joints are kept in a single JointTracks,
+    and updated together. In both cases joint_hists maps each joint to an
+    object with track and visibility.
     """
 
     def __init__(
         self,
         joint_names: tuple[JOINT_NAMES_TYPE] = JOINT_NAMES,
         pose_img_kwargs: dict[str, Any] = {},
+        hist_capacity: int = 256,
+        storage: Literal["hist", "stacked"] = "hist",
+        homography_mode: Literal["pair", "keyframe", "klt"] = "pair",
+        homography_kwargs: dict[str, Any] = {},
     ) -> None:
-        """Create the JointTracker."""
+        """Create the JointTracker.
+
+        Args:
+            joint_names: The joints to track.
+            pose_img_kwargs: Arguments for the PoseImg.
+            hist_capacity: Number of frames to preallocate in each joint history.
+            storage: How to store the joint histories, "hist" or "stacked".
+            homography_mode: How process_next_frame computes the homographies:
+                "pair" registers each frame against the previous one,
+                "keyframe" registers each frame against a keyframe,
+                "klt" tracks the points of the previous frame with optical flow.
+            homography_kwargs: Arguments for the StreamHomography,
+                the KeyframeHomography or the KltHomography.
+        """
         self.joint_names = joint_names
+        self.storage = storage
 
         # initialize the tracks for each joint
-        self.joint_hists: dict[JOINT_NAMES_TYPE, JointHist] = {}
-        for joint_name in joint_names:
-            self.joint_hists[joint_name] = JointHist(joint_name)
+        self.joint_hists: dict[JOINT_NAMES_TYPE, JointHist | JointTrackView] = {}
+        self.joint_tracks: JointTracks | None = None
+        if storage == "stacked":
+            self.joint_tracks = JointTracks(joint_names, hist_capacity)
+            self._set_joint_views()
+        else:
+            for joint_name in joint_names:
+                self.joint_hists[joint_name] = JointHist(joint_name, hist_capacity)
+
+        # initialize the motion model
+        self.homography_mode = homography_mode
+        self.motion: MotionModel
+        if homography_mode == "keyframe":
+            self.motion = KeyframeHomography(**homography_kwargs)
+        elif homography_mode == "klt":
+            self.motion = KltHomography(**homography_kwargs)
+        else:
+            self.motion = StreamHomography(**homography_kwargs)
 
-        # initialize the pose estimator
-        self.pose_img = PoseImg(**pose_img_kwargs)
+        # the pose estimator is created on first use,
+        # so that replaying stored landmarks does not load MediaPipe
+        self.pose_img_kwargs = pose_img_kwargs
+        self._pose_img: "PoseImg | None" = None
+
+    @property
+    def pose_img(self) -> "PoseImg":
+        """The pose estimator, created on first use."""
+        if self._pose_img is None:
+            from climbing_wire.landmark.compute import PoseImg
+
+            self._pose_img = PoseImg(**self.pose_img_kwargs)
+        return self._pose_img
 
     def process_frame_pair(
         self,
@@ -44,13 +103,90 @@ class JointTracker:
         frame2: np.ndarray,
     ) -> None:
         """Process a pair of frames."""
-        self.frame2 = frame2.copy()
-        self.M = compute_homography(frame1, frame2)
-        self.landlist = self.pose_img(frame2)
+        M = compute_homography(frame1, frame2)
+        self.process_frame(frame2, M)
+
+    def process_next_frame(
+        self,
+        frame: np.ndarray,
+    ) -> None:
+        """Process the next frame of the video, using the tracker motion model.
+
+        The first frame is only used as reference for the homographies.
+        If the homography fails, the history restarts from this frame.
+        """
+        is_first, M = self.next_homography(frame)
+        if is_first:
+            return
+        self.process_frame(frame, M)
+
+    def next_homography(
+        self,
+        frame: np.ndarray,
+    ) -> tuple[bool, np.ndarray | None]:
+        """Run the motion model on the next frame of the video.
+
+        Returns:
+            Whether this is the first frame, only used as reference,
+            and the homography from the previous frame, None if it failed.
+        """
+        try:
+            M = self.motion(frame)
+        except ValueError as exc:
+            lg.warning(f"Homography failed: {exc}")
+            return False, None
+        return M is None, M
+
+    def replay_next_frame(
+        self,
+        frame: np.ndarray,
+        landlist: LandmarkListImg | None,
+    ) -> None:
+        """Process the next frame of the video, with landmarks already computed.
+
+        Use with a LandmarkRecord to skip the pose estimation.
+        The first frame is only used as reference for the homographies.
+        """
+        is_first, M = self.next_homography(frame)
+        if is_first:
+            return
+        self.update(frame, M, landlist)
+
+    def process_frame(
+        self,
+        frame: np.ndarray,
+        M: np.ndarray | None,
+    ) -> None:
+        """Process a frame, given the homography from the previous one.
+
+        Use with iterate_frame_homographies to extract the features
+        of each frame only once. If M is None, see update.
+        """
+        self.update(frame, M, self.pose_img(frame))
+
+    def update(
+        self,
+        frame: np.ndarray,
+        M: np.ndarray | None,
+        landlist: LandmarkListImg | None,
+    ) -> None:
+        """Update the tracker with a frame, its homography and its landmarks.
+
+        Use it when the landmarks were computed elsewhere, e.g. by a pipeline.
+        If the homography from the previous frame is None, the past positions
+        cannot be brought in this frame: the history restarts from it.
+        """
+        self.frame2 = frame.copy()
+        self.M = M
+        self.landlist = landlist
+        if M is None:
+            lg.warning("No homography for the frame, restarting the history.")
+            self.clear()
+            M = np.eye(3)
         if self.landlist is None:
             lg.warning("No landmarks found in frame.")
             return
-        self.add_frame(self.landlist, self.M)
+        self.add_frame(self.landlist, M)
 
     def add_frame(
         self,
@@ -58,22 +194,63 @@ class JointTracker:
         M: np.ndarray,
     ) -> None:
         """Add a new frame to the history."""
-        for joint_name in JOINT_NAMES:
+        if self.joint_tracks is not None:
+            self.joint_tracks.add_frame(landlist, M)
+            return
+        for joint_name in self.joint_names:
             self.joint_hists[joint_name].add_frame(landlist, M)
 
+    def clear(self) -> None:
+        """Drop the joint histories, the next frame becomes the anchor."""
+        if self.joint_tracks is not None:
+            self.joint_tracks.clear()
+            return
+        for joint_hist in self.joint_hists.values():
+            joint_hist.clear()
+
+    def _set_joint_views(self) -> None:
+        """Expose the stacked joint tracks as per-joint views."""
+        assert self.joint_tracks is not None
+        self.joint_hists = {
+            joint_name: self.joint_tracks[joint_name] for joint_name in self.joint_names
+        }
+
+    def snapshot(self) -> "JointTrackerSnapshot":
+        """Return an immutable view of the tracker at the current frame.
+
+        Unlike copy, this is O(1): the joint histories share the append-only
+        buffers of the tracker, and the frame, the homography and the landmarks
+        are referenced rather than copied. They must not be modified in place.
+        """
+        return JointTrackerSnapshot(
+            joint_names=self.joint_names,
+            joint_hists={
+                joint_name: joint_hist.snapshot()
+                for joint_name, joint_hist in self.joint_hists.items()
+            },
+            frame2=getattr(self, "frame2", None),
+            M=getattr(self, "M", None),
+            landlist=getattr(self, "landlist", None),
+        )
+
     def copy(self) -> Self:
         """Return a copy of the JointTracker.
-        
+
         The pose_img is not copied.
         """
-        jt = JointTracker()
+        jt = JointTracker(storage=self.storage)
         jt.joint_names = self.joint_names
-        jt.joint_hists = {
-            joint_name: joint_hist.copy()
-            for joint_name, joint_hist in self.joint_hists.items()
-        }
-        jt.pose_img = self.pose_img
-        jt.M = self.M.copy()
+        if self.joint_tracks is not None:
+            jt.joint_tracks = self.joint_tracks.copy()
+            jt._set_joint_views()
+        else:
+            jt.joint_hists = {
+                joint_name: joint_hist.copy()
+                for joint_name, joint_hist in self.joint_hists.items()
+            }
+        jt.pose_img_kwargs = self.pose_img_kwargs
+        jt._pose_img = self._pose_img
+        jt.M = self.M.copy() if self.M is not None else None
         if self.landlist is not None:
             jt.landlist = self.landlist.copy()
         else:
@@ -83,4 +260,19 @@ class JointTracker:
 
     def close(self) -> None:
         """Close the JointTracker."""
-        self.pose_img.close()
+        if self._pose_img is not None:
+            self._pose_img.close()
+
+
+@dataclass(frozen=True)
+class JointTrackerSnapshot:
+    """An immutable view of a JointTracker at a given frame.
+
+    Exposes the same joint_hists, frame2, M and landlist as the tracker.
+    """
+
+    joint_names: tuple[JOINT_NAMES_TYPE]
+    joint_hists: dict[JOINT_NAMES_TYPE, JointHistSnapshot]
+    frame2: np.ndarray | None
+    M: np.ndarray | None
+    landlist: LandmarkListImg | None
@@ -0,0 +1,202 @@
+"""Track the history of several joints across multiple frames, in one array.
+
+All the joints share the same homographies, so they are stored together
+and updated with a single perspective transform per frame.
+"""
+
+from typing import Self, Sequence
+
+import numpy as np
+
+from climbing_wire.homography.homography import perspective_transform
+from climbing_wire.joint_tracker.joint_hist import JointHistSnapshot, advance_anchor
+from climbing_wire.landmark.landmark_list import LandmarkListImg
+from climbing_wire.utils.mediapipe import JOINT_NAMES_TYPE
+
+
+class JointTracks:
+    """Track the history of several joints across multiple frames.
+
+    The positions are stored in a (joints, frames, 2) array, in the
+    coordinates of an anchor frame, as in JointHist.
+    """
+
+    def __init__(
+        self,
+        joint_names: Sequence[JOINT_NAMES_TYPE],
+        capacity: int = 256,
+        max_anchor_cond: float = 1e4,
+    ) -> None:
+        """Create the JointTracks.
+
+        Args:
+            joint_names: The joints to track.
+            capacity: Number of frames to preallocate.
+            max_anchor_cond: When the condition number of the cumulative
+                homography, in frame-size units, grows above this,
+                the current frame becomes the new anchor, to avoid losing
+                precision. See advance_anchor.
+        """
+        self.joint_names = tuple(joint_names)
+        self.joint_idx = {name: i for i, name in enumerate(self.joint_names)}
+        self.max_anchor_cond = max_anchor_cond
+
+        # prepare the joint tracks data
+        num_joints = len(self.joint_names)
+        self._anchor_buf = np.empty((num_joints, max(capacity, 1), 2), float)
+        self._visibility_buf = np.empty((num_joints, max(capacity, 1)), float)
+        self._len = 0
+
+        # homography from the anchor frame to the current frame
+        self.C = np.eye(3)
+        # tracks in the current frame, computed when needed
+        self._tracks: np.ndarray | None = None
+
+    @property
+    def anchor_tracks(self) -> np.ndarray:
+        """The joint positions in the anchor frame, as a (J, N, 2) view."""
+        return self._anchor_buf[:, : self._len]
+
+    @property
+    def tracks(self) -> np.ndarray:
+        """The joint positions in the current frame, as a (J, N, 2) array."""
+        if self._tracks is None:
+            num_joints = len(self.joint_names)
+            anchor = self.anchor_tracks.reshape(-1, 2)
+            tracks = perspective_transform(anchor, self.C)
+            self._tracks = tracks.reshape(num_joints, self._len, 2)
+        return self._tracks
+
+    @property
+    def visibility(self) -> np.ndarray:
+        """The visibility of the joints in each frame, as a (J, N) view."""
+        return self._visibility_buf[:, : self._len]
+
+    @property
+    def capacity(self) -> int:
+        """Number of frames that fit in the buffers."""
+        return self._anchor_buf.shape[1]
+
+    def _reserve(self, size: int) -> None:
+        """Grow the buffers, doubling them, to hold at least size frames."""
+        if size <= self.capacity:
+            return
+        new_capacity = max(size, 2 * self.capacity)
+        num_joints = len(self.joint_names)
+        anchor_buf = np.empty((num_joints, new_capacity, 2), float)
+        anchor_buf[:, : self._len] = self.anchor_tracks
+        visibility_buf = np.empty((num_joints, new_capacity), float)
+        visibility_buf[:, : self._len] = self.visibility
+        self._anchor_buf = anchor_buf
+        self._visibility_buf = visibility_buf
+
+    def _rebase(self) -> None:
+        """Move the anchor to the current frame.
+
+        The positions are written in a new buffer, as the stored ones
+        might be shared with snapshots.
+        """
+        anchor_buf = np.empty_like(self._anchor_buf)
+        anchor_buf[:, : self._len] = self.tracks
+        self._anchor_buf = anchor_buf
+        self.C = np.eye(3)
+
+    def add_frame(
+        self,
+        landlist: LandmarkListImg,
+        M: np.ndarray,
+    ) -> None:
+        """Add a new frame to the history.
+
+        Args:
+            landlist: The landmarks in the new frame.
+            M: The homography from the previous frame to the new one.
+        """
+        # move the current frame forward
+        self.C, C_inv, rebase = advance_anchor(
+            self.C, M, landlist.img_shape, self.max_anchor_cond
+        )
+        self._tracks = None
+        if rebase:
+            self._rebase()
+            C_inv = np.eye(3)
+
+        # get the new joint positions, and bring them back to the anchor frame
+        lms, vizs = landlist.get_landmarks_for_joints(self.joint_names)
+        lms_anchor = perspective_transform(lms.astype(float), C_inv)
+        self._reserve(self._len + 1)
+        self._anchor_buf[:, self._len] = lms_anchor
+        self._visibility_buf[:, self._len] = vizs
+        self._len += 1
+
+    def clear(self) -> None:
+        """Drop the history, the next frame becomes the anchor.
+
+        New buffers are allocated, as the stored ones might be shared
+        with snapshots.
+        """
+        self._anchor_buf = np.empty_like(self._anchor_buf)
+        self._visibility_buf = np.empty_like(self._visibility_buf)
+        self._len = 0
+        self.C = np.eye(3)
+        self._tracks = None
+
+    def __getitem__(self, which_joint: JOINT_NAMES_TYPE) -> "JointTrackView":
+        """Get a view on the history of a single joint."""
+        return JointTrackView(self, which_joint)
+
+    def __len__(self) -> int:
+        """Return the number of frames in the history."""
+        return self._len
+
+    def copy(self) -> Self:
+        """Return a copy of the JointTracks."""
+        jt = JointTracks(self.joint_names, self.capacity, self.max_anchor_cond)
+        jt._anchor_buf[:, : self._len] = self.anchor_tracks
+        jt._visibility_buf[:, : self._len] = self.visibility
+        jt._len = self._len
+        jt.C = self.C.copy()
+        return jt
+
+
+class JointTrackView:
+    """The history of a single joint in a JointTracks.
+
+    Exposes the same track and visibility as a JointHist.
+    """
+
+    def __init__(
+        self,
+        joint_tracks: JointTracks,
+        which_joint: JOINT_NAMES_TYPE,
+    ) -> None:
+        """Create the view."""
+        self.joint_tracks = joint_tracks
+        self.which_joint = which_joint
+        self.joint_idx = joint_tracks.joint_idx[which_joint]
+
+    @property
+    def track(self) -> np.ndarray:
+        """The joint positions in the current frame, as a (N, 2) view."""
+        return self.joint_tracks.tracks[self.joint_idx]
+
+    @property
+    def visibility(self) -> np.ndarray:
+        """The visibility of the joint in each frame, as a (N,) view."""
+        return self.joint_tracks.visibility[self.joint_idx]
+
+    def __len__(self) -> int:
+        """Return the number of frames in the history."""
+        return len(self.joint_tracks)
+
+    def snapshot(self) -> JointHistSnapshot:
+        """Return an immutable view of the current history, in O(1).
+
+        The buffers are append-only, so the snapshot shares them.
+        """
+        return JointHistSnapshot(
+            self.which_joint,
+            self.joint_tracks.anchor_tracks[self.joint_idx],
+            self.visibility,
+            self.joint_tracks.C.copy(),
+        )
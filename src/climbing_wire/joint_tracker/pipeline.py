@@ -0,0 +1,206 @@
+"""Run a JointTracker on a video as a pipeline of stages.
+
+Decoding, homography, pose estimation and drawing each run in their own
+thread, connected by bounded queues. OpenCV and MediaPipe release the GIL
+for most of their work, so the decode of the next frame overlaps with the
+homography and the pose of the current one. When a stage is slower than the
+others, the queues before it fill up and block the earlier stages, so only
+a few frames are in memory at any time.
+
+The tracker state is updated in frame order by a single stage,
+so it ends up the same as with the serial loop.
+"""
+
+from queue import Empty, Full, Queue
+from threading import Event, Thread
+from typing import Any, Callable, Generator, Iterable, TypeVar
+
+import numpy as np
+
+from climbing_wire.joint_tracker.joint_tracker import (
+    JointTracker,
+    JointTrackerSnapshot,
+)
+
+T = TypeVar("T")
+
+# marks the end of the stream in a queue
+_END = object()
+
+# how long a blocked stage waits before checking if the pipeline was stopped
+_POLL_SEC = 0.1
+
+
+class _StageError:
+    """An exception raised in a stage, forwarded down the pipeline."""
+
+    def __init__(self, exc: BaseException) -> None:
+        """Wrap the exception."""
+        self.exc = exc
+
+
+def _put(q: Queue, item: Any, stop: Event) -> bool:
+    """Put an item in the queue, waiting for space unless the pipeline stops.
+
+    Returns:
+        False if the pipeline was stopped before the item was put.
+    """
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=_POLL_SEC)
+            return True
+        except Full:
+            continue
+    return False
+
+
+def _get(q: Queue, stop: Event) -> Any:
+    """Get an item from the queue, returning _END if the pipeline stops."""
+    while not stop.is_set():
+        try:
+            return q.get(timeout=_POLL_SEC)
+        except Empty:
+            continue
+    return _END
+
+
+def _source_stage(
+    items: Iterable[Any],
+    q_out: Queue,
+    stop: Event,
+) -> None:
+    """Push the items of an iterable in the queue."""
+    try:
+        for item in items:
+            if not _put(q_out, item, stop):
+                return
+    except Exception as exc:
+        _put(q_out, _StageError(exc), stop)
+        return
+    _put(q_out, _END, stop)
+
+
+def _map_stage(
+    func: Callable[[Any], Any],
+    q_in: Queue,
+    q_out: Queue,
+    stop: Event,
+) -> None:
+    """Apply func to the items of a queue, in order.
+
+    Items for which func returns None are dropped.
+    Errors and the end of the stream are forwarded.
+    """
+    while True:
+        item = _get(q_in, stop)
+        if item is _END or isinstance(item, _StageError):
+            _put(q_out, item, stop)
+            return
+        try:
+            result = func(item)
+        except Exception as exc:
+            _put(q_out, _StageError(exc), stop)
+            return
+        if result is not None and not _put(q_out, result, stop):
+            return
+
+
+class JointTrackerPipeline:
+    """Run a JointTracker on a stream of frames, with a thread per stage.
+
+    The stages are:
+        decode: iterate over the frames.
+        homography: the tracker motion model, on each frame in order.
+        pose: the tracker PoseImg, on each frame in order.
+        track: update the tracker state, and take a snapshot.
+        draw: the optional draw function, on each snapshot.
+
+    Iterating over the pipeline yields the snapshot of the tracker after each
+    frame, or the output of draw if given.
+    The first frame is only used as reference for the homographies,
+    as in JointTracker.process_next_frame.
+    """
+
+    def __init__(
+        self,
+        tracker: JointTracker,
+        queue_size: int = 4,
+    ) -> None:
+        """Create the pipeline.
+
+        Args:
+            tracker: The tracker to run. Its motion model and its PoseImg are
+                used by the pipeline, and its state is updated in place.
+            queue_size: Maximum number of items waiting between two stages.
+        """
+        self.tracker = tracker
+        self.queue_size = queue_size
+
+    def _homography(
+        self,
+        frame: np.ndarray,
+    ) -> tuple[np.ndarray, np.ndarray | None] | None:
+        """Compute the homography from the previous frame.
+
+        The first frame is dropped, a failed homography is passed as None.
+        """
+        is_first, M = self.tracker.next_homography(frame)
+        if is_first:
+            return None
+        return frame, M
+
+    def _pose(self, item: tuple[np.ndarray, np.ndarray]) -> tuple[Any, ...]:
+        """Compute the landmarks of the frame."""
+        frame, M = item
+        return frame, M, self.tracker.pose_img(frame)
+
+    def _track(self, item: tuple[Any, ...]) -> JointTrackerSnapshot:
+        """Update the tracker and take a snapshot of it."""
+        self.tracker.update(*item)
+        return self.tracker.snapshot()
+
+    def run(
+        self,
+        frames: Iterable[np.ndarray],
+        draw: Callable[[JointTrackerSnapshot], T] | None = None,
+    ) -> Generator[JointTrackerSnapshot | T, None, None]:
+        """Run the pipeline on the frames.
+
+        Args:
+            frames: The frames, in order, e.g. from iterate_video_frames.
+            draw: Optional function to draw each snapshot, run in its own stage.
+
+        Yields:
+            The snapshot of the tracker after each frame,
+            or the output of draw on it.
+
+        Raises:
+            Exception: Any exception raised in a stage is raised here,
+                after the pipeline is stopped.
+        """
+        funcs: list[Callable[[Any], Any]] = [self._homography, self._pose, self._track]
+        if draw is not None:
+            funcs.append(draw)
+
+        stop = Event()
+        queues: list[Queue] = [Queue(self.queue_size) for _ in range(len(funcs) + 1)]
+        threads = [Thread(target=_source_stage, args=(frames, queues[0], stop))]
+        for func, q_in, q_out in zip(funcs, queues[:-1], queues[1:]):
+            threads.append(Thread(target=_map_stage, args=(func, q_in, q_out, stop)))
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+
+        try:
+            while True:
+                item = _get(queues[-1], stop)
+                if item is _END:
+                    break
+                if isinstance(item, _StageError):
+                    raise item.exc
+                yield item
+        finally:
+            # stop all the stages, also if the consumer stopped early
+            stop.set()
+            for thread in threads:
+                thread.join()
@@ -0,0 +1,211 @@
+"""Store the landmarks computed on a video, to replay them without MediaPipe.
+
+The landmarks of all the frames are kept in a single (frames, 33, 4) array of
+normalized x, y, z and visibility, with a flag for the frames where a pose was
+found, and the timestamp of each frame.
+The cache keys them by the fingerprint of the video and the PoseImg arguments
+that change the inference.
+"""
+
+from dataclasses import dataclass
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, Self
+
+from loguru import logger as lg
+import numpy as np
+
+from climbing_wire.landmark.landmark_list import LandmarkListImg
+from climbing_wire.utils.data import file_fingerprint
+from climbing_wire.utils.mediapipe import NUM_POSE_LANDMARKS
+from climbing_wire.video.load import iterate_video_frames_with_timestamp
+
+# same as the defaults of PoseImg, that change the inference
+POSE_IMG_DEFAULTS = {
+    "static_image_mode": False,
+    "model_complexity": 1,
+    "smooth_landmarks": True,
+    "enable_segmentation": False,
+    "smooth_segmentation": True,
+    "min_detection_confidence": 0.5,
+    "min_tracking_confidence": 0.5,
+    "roi_tracking": False,
+    "roi_padding": 0.3,
+    "roi_motion_gain": 2.0,
+    "roi_min_size": 128,
+    "roi_reset_shift": 0.1,
+    "max_inference_size": None,
+}
+
+
+@dataclass
+class LandmarkRecord:
+    """The landmarks computed on each frame of a video.
+
+    Attributes:
+        landmarks: The (N, 33, 4) normalized x, y, z and visibility,
+            zero where no pose was found.
+        found: The (N,) flags of the frames where a pose was found.
+        usecs: The (N,) timestamps of the frames in μsec.
+        img_shape: Size of the frames.
+    """
+
+    landmarks: np.ndarray
+    found: np.ndarray
+    usecs: np.ndarray
+    img_shape: tuple[int, int]
+
+    @classmethod
+    def from_landlists(
+        cls,
+        landlists: list[LandmarkListImg | None],
+        usecs: list[int],
+        img_shape: tuple[int, int],
+    ) -> Self:
+        """Pack the landmarks of each frame, None where no pose was found."""
+        landmarks = np.zeros((len(landlists), NUM_POSE_LANDMARKS, 4), np.float32)
+        found = np.zeros(len(landlists), dtype=bool)
+        for i, landlist in enumerate(landlists):
+            if landlist is None:
+                continue
+            landmarks[i] = landlist.to_array()
+            found[i] = True
+        return cls(landmarks, found, np.array(usecs, dtype=np.int64), img_shape)
+
+    def landlist(
+        self,
+        i: int,
+        visibility_threshold: float = 0.5,
+    ) -> LandmarkListImg | None:
+        """Get the landmarks of a frame, None if no pose was found."""
+        if not self.found[i]:
+            return None
+        return LandmarkListImg.from_array(
+            self.landmarks[i], self.img_shape, visibility_threshold
+        )
+
+    def landlists(
+        self,
+        visibility_threshold: float = 0.5,
+    ) -> list[LandmarkListImg | None]:
+        """Get the landmarks of all the frames."""
+        return [self.landlist(i, visibility_threshold) for i in range(len(self))]
+
+    def __len__(self) -> int:
+        """Return the number of frames."""
+        return len(self.found)
+
+    def save(self, file_path: Path) -> None:
+        """Save the record in a npz file."""
+        with file_path.open("wb") as f:
+            np.savez(
+                f,
+                landmarks=self.landmarks,
+                found=self.found,
+                usecs=self.usecs,
+                img_shape=np.array(self.img_shape),
+            )
+
+    @classmethod
+    def load(cls, file_path: Path) -> Self:
+        """Load a record saved with save."""
+        with np.load(file_path) as data:
+            h, w = data["img_shape"]
+            return cls(
+                data["landmarks"], data["found"], data["usecs"], (int(h), int(w))
+            )
+
+
+class LandmarkCache:
+    """Cache the LandmarkRecord of videos in a folder.
+
+    A record is keyed by the video fingerprint, the PoseImg arguments
+    that change the inference and the frames that were processed.
+    The visibility_threshold is applied when replaying, so it is not in the key.
+    """
+
+    def __init__(self, cache_fol: Path) -> None:
+        """Create the LandmarkCache.
+
+        Args:
+            cache_fol: The folder of the cache, created if missing.
+        """
+        self.cache_fol = cache_fol
+        self.cache_fol.mkdir(parents=True, exist_ok=True)
+
+    def record_path(
+        self,
+        in_vid_path: Path,
+        pose_img_kwargs: dict[str, Any],
+        keep_every_nth_frame: int = 1,
+    ) -> Path:
+        """Get the path of the record for a video and a pose config."""
+        config = POSE_IMG_DEFAULTS | {
+            k: v for k, v in pose_img_kwargs.items() if k in POSE_IMG_DEFAULTS
+        }
+        config["keep_every_nth_frame"] = keep_every_nth_frame
+        config_str = json.dumps(config, sort_keys=True)
+        config_hash = hashlib.sha1(config_str.encode()).hexdigest()[:16]
+        return self.cache_fol / f"{file_fingerprint(in_vid_path)}_{config_hash}.npz"
+
+    def get(
+        self,
+        in_vid_path: Path,
+        pose_img_kwargs: dict[str, Any],
+        keep_every_nth_frame: int = 1,
+    ) -> LandmarkRecord | None:
+        """Get the record of a video, None if it is not in the cache."""
+        path = self.record_path(in_vid_path, pose_img_kwargs, keep_every_nth_frame)
+        if not path.exists():
+            return None
+        return LandmarkRecord.load(path)
+
+    def put(
+        self,
+        in_vid_path: Path,
+        pose_img_kwargs: dict[str, Any],
+        record: LandmarkRecord,
+        keep_every_nth_frame: int = 1,
+    ) -> None:
+        """Store the record of a video."""
+        path = self.record_path(in_vid_path, pose_img_kwargs, keep_every_nth_frame)
+        # write to a temporary file, so that a partial record is never read
+        tmp_path = path.with_suffix(".tmp")
+        record.save(tmp_path)
+        tmp_path.replace(path)
+
+    def compute(
+        self,
+        in_vid_path: Path,
+        pose_img_kwargs: dict[str, Any] = {},
+        keep_every_nth_frame: int = 1,
+    ) -> LandmarkRecord:
+        """Get the record of a video, running MediaPipe only if not cached.
+
+        Args:
+            in_vid_path: Input video file.
+            pose_img_kwargs: Arguments for the PoseImg.
+            keep_every_nth_frame: Keep every nth frame.
+        """
+        record = self.get(in_vid_path, pose_img_kwargs, keep_every_nth_frame)
+        if record is not None:
+            return record
+
+        # only load MediaPipe if we need to run it
+        from climbing_wire.landmark.compute import PoseImg
+
+        lg.info(f"Computing the landmarks of {in_vid_path}")
+        landlists: list[LandmarkListImg | None] = []
+        usecs: list[int] = []
+        img_shape = (0, 0)
+        with PoseImg(**pose_img_kwargs) as pose_img:
+            for frame, usec in iterate_video_frames_with_timestamp(
+                in_vid_path, keep_every_nth_frame
+            ):
+                landlists.append(pose_img(frame))
+                usecs.append(usec)
+                img_shape = frame.shape[:2]
+        record = LandmarkRecord.from_landlists(landlists, usecs, img_shape)
+        self.put(in_vid_path, pose_img_kwargs, record, keep_every_nth_frame)
+        return record
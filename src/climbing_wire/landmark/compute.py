@@ -6,7 +6,7 @@ from mediapipe.framework.formats import landmark_pb2
 import mediapipe.python.solutions.pose as mp_pose
 import numpy as np
 
-from climbing_wire.landmark.landmark_list import LandmarkListImg
+from climbing_wire.landmark.landmark_list import LandmarkListImg, landmarks_to_array
 
 
 class PoseImg:
@@ -26,6 +26,12 @@ class PoseImg:
         min_detection_confidence: float = 0.5,
         min_tracking_confidence: float = 0.5,
         visibility_threshold: float = 0.5,
+        roi_tracking: bool = False,
+        roi_padding: float = 0.3,
+        roi_motion_gain: float = 2.0,
+        roi_min_size: int = 128,
+        roi_reset_shift: float = 0.1,
+        max_inference_size: int | None = None,
     ) -> None:
         """Initialize a PoseImg object.
 
@@ -50,6 +56,21 @@ class PoseImg:
             pose landmarks to be considered tracked successfully. See details in
             https://solutions.mediapipe.dev/pose#min_tracking_confidence.
         visibility_threshold: Minimum visibility value for a landmark.
+        roi_tracking: Whether to run the inference on a crop around the
+            drawable landmarks of the previous frame, instead of the full frame.
+            If no pose is found in the crop, the full frame is used.
+        roi_padding: Padding around the landmarks, as a fraction of the
+            size of their bounding box.
+        roi_motion_gain: Extra padding, as a multiple of the motion of the
+            landmarks since the previous frame, in pixels.
+        roi_min_size: Minimum width and height of the crop, in pixels.
+        roi_reset_shift: In video mode, restart the MediaPipe tracking when
+            an edge of the crop moves by more than this fraction of its size.
+            Smaller moves keep the tracking state.
+        max_inference_size: Downscale the images so that their longer side
+            is at most this, before running MediaPipe. The landmarks are
+            normalized, so they still map exactly to the original image.
+            None to use the images at full resolution.
         """
         self.pose = mp_pose.Pose(
             static_image_mode=static_image_mode,
@@ -62,6 +83,26 @@ class PoseImg:
         )
         self.visibility_threshold = visibility_threshold
 
+        # the tracking region of interest
+        self.roi_tracking = roi_tracking
+        self.roi_padding = roi_padding
+        self.roi_motion_gain = roi_motion_gain
+        self.roi_min_size = roi_min_size
+        self.roi_reset_shift = roi_reset_shift
+        # the crop as (x0, y0, x1, y1), and the center of the previous landmarks
+        self.roi: tuple[int, int, int, int] | None = None
+        self.prev_center: np.ndarray | None = None
+        self.roi_fallback_count = 0
+        self.roi_reset_count = 0
+        # the crop of the last image sent to MediaPipe, None for the full image
+        self.static_image_mode = static_image_mode
+        self._input_roi: tuple[int, int, int, int] | None = None
+
+        # the buffers reused to prepare the image for MediaPipe
+        self.max_inference_size = max_inference_size
+        self._small_buf: np.ndarray | None = None
+        self._rgb_buf: np.ndarray | None = None
+
     def __call__(
         self,
         image: np.ndarray,
@@ -83,15 +124,163 @@ class PoseImg:
             if visibility_threshold is not None
             else self.visibility_threshold
         )
-        lms = compute_landmarks(image, self.pose)
+        if self.roi_tracking:
+            lli = self._compute_in_roi(image, visibility_threshold)
+            if lli is None:
+                if self.roi is not None:
+                    self.roi_fallback_count += 1
+                lli = self._compute_in_full(image, visibility_threshold)
+            self._update_roi(lli, image.shape[:2])
+            return lli
+        return self._compute_in_full(image, visibility_threshold)
+
+    def _compute_in_full(
+        self,
+        image: np.ndarray,
+        visibility_threshold: float,
+    ) -> LandmarkListImg | None:
+        """Compute the landmarks on the full image."""
+        lms = self._compute_landmarks(image, None)
         if lms is None:
             return None
         lli = LandmarkListImg(lms, image.shape[:2], visibility_threshold)
         return lli
 
+    def _compute_landmarks(
+        self,
+        image: np.ndarray,
+        roi: tuple[int, int, int, int] | None,
+    ) -> landmark_pb2.NormalizedLandmarkList | None:
+        """Run MediaPipe on a crop of the image, or on the full image.
+
+        In video mode MediaPipe tracks the pose from the previous image,
+        in normalized coordinates: when the crop jumps, the tracking is
+        reset so that the pose is detected again in the new crop.
+        """
+        if not self.static_image_mode and self._roi_jumped(roi):
+            self.pose.reset()
+            self.roi_reset_count += 1
+        self._input_roi = roi
+        if roi is not None:
+            x0, y0, x1, y1 = roi
+            image = image[y0:y1, x0:x1]
+        return compute_landmarks_rgb(self._to_inference_rgb(image), self.pose)
+
+    def _roi_jumped(self, roi: tuple[int, int, int, int] | None) -> bool:
+        """Whether the crop changed too much to keep the MediaPipe tracking.
+
+        Switching between the crop and the full image is always a jump,
+        a crop that moved or resized is one if an edge moved by more than
+        roi_reset_shift of the size of the previous crop.
+        """
+        prev_roi = self._input_roi
+        if roi == prev_roi:
+            return False
+        if roi is None or prev_roi is None:
+            return True
+        px0, py0, px1, py1 = prev_roi
+        prev_size = np.array([px1 - px0, py1 - py0] * 2)
+        shift = np.abs(np.subtract(roi, prev_roi)) / prev_size
+        return bool(shift.max() > self.roi_reset_shift)
+
+    def _to_inference_rgb(self, image: np.ndarray) -> np.ndarray:
+        """Downscale the BGR image if needed, and convert it to RGB.
+
+        Both steps write in buffers reused across frames of the same size.
+        """
+        h, w = image.shape[:2]
+        max_size = self.max_inference_size
+        if max_size is not None and max(h, w) > max_size:
+            scale = max_size / max(h, w)
+            size = (max(round(w * scale), 1), max(round(h * scale), 1))
+            self._small_buf = _reuse_buffer(self._small_buf, (size[1], size[0], 3))
+            image = cv.resize(
+                image, size, dst=self._small_buf, interpolation=cv.INTER_AREA
+            )
+        self._rgb_buf = _reuse_buffer(self._rgb_buf, image.shape)
+        return cv.cvtColor(image, cv.COLOR_BGR2RGB, dst=self._rgb_buf)
+
+    def _compute_in_roi(
+        self,
+        image: np.ndarray,
+        visibility_threshold: float,
+    ) -> LandmarkListImg | None:
+        """Compute the landmarks on the tracking ROI, in full image coordinates."""
+        if self.roi is None:
+            return None
+        x0, y0, x1, y1 = self.roi
+        lms = self._compute_landmarks(image, self.roi)
+        if lms is None:
+            return None
+
+        # map the landmarks from the crop to the full image
+        h, w = image.shape[:2]
+        landmarks = landmarks_to_array(lms)
+        landmarks[:, 0] = (landmarks[:, 0] * (x1 - x0) + x0) / w
+        landmarks[:, 1] = (landmarks[:, 1] * (y1 - y0) + y0) / h
+        # the depth uses the same scale as x
+        landmarks[:, 2] *= (x1 - x0) / w
+        return LandmarkListImg.from_array(landmarks, (h, w), visibility_threshold)
+
+    def _update_roi(
+        self,
+        lli: LandmarkListImg | None,
+        img_shape: tuple[int, ...],
+    ) -> None:
+        """Move the tracking ROI around the landmarks just found.
+
+        The ROI is kept while the landmarks stay well inside it, so that
+        MediaPipe sees a stable image in video mode, and is recomputed when
+        they get close to its border or it became much larger than needed.
+        """
+        if lli is None or not lli.drawable.any():
+            self.reset_roi()
+            return
+
+        # the bounding box of the landmarks, and how much it moved
+        pts = lli.landmarks_img[lli.drawable]
+        box_min = pts.min(axis=0)
+        box_max = pts.max(axis=0)
+        center = (box_min + box_max) / 2
+        motion = 0.0
+        if self.prev_center is not None:
+            motion = float(np.linalg.norm(center - self.prev_center))
+        self.prev_center = center
+
+        # the crop needed for this frame
+        h, w = img_shape[:2]
+        pad = self.roi_padding * (box_max - box_min).max()
+        pad += self.roi_motion_gain * motion
+        half_size = np.maximum(box_max - box_min + 2 * pad, self.roi_min_size) / 2
+        x0, y0 = np.maximum(np.floor(center - half_size), 0).astype(int)
+        x1, y1 = np.ceil(center + half_size).astype(int)
+        new_roi = (int(x0), int(y0), int(min(x1, w)), int(min(y1, h)))
+
+        # keep the current crop if it still fits
+        if self.roi is not None:
+            rx0, ry0, rx1, ry1 = self.roi
+            inside = (
+                box_min[0] - pad / 2 >= rx0
+                and box_min[1] - pad / 2 >= ry0
+                and box_max[0] + pad / 2 <= rx1
+                and box_max[1] + pad / 2 <= ry1
+            )
+            area = (rx1 - rx0) * (ry1 - ry0)
+            new_area = (new_roi[2] - new_roi[0]) * (new_roi[3] - new_roi[1])
+            if inside and area <= 2 * new_area:
+                return
+        self.roi = new_roi
+
+    def reset_roi(self) -> None:
+        """Forget the tracking ROI, the next frame is processed in full."""
+        self.roi = None
+        self.prev_center = None
+
     def __del__(self) -> None:
-        """Close the pose object."""
-        self.pose.close()
+        """Close the pose object, once."""
+        if getattr(self, "pose", None) is not None:
+            self.pose.close()
+            self.pose = None
 
     def close(self) -> None:
         """Close the pose object."""
@@ -114,6 +303,31 @@ class PoseImg:
         return self.__repr__()
 
 
+def _reuse_buffer(
+    buf: np.ndarray | None,
+    shape: tuple[int, ...],
+) -> np.ndarray:
+    """Return the buffer if it has the right shape, else a new one."""
+    if buf is None or buf.shape != shape:
+        return np.empty(shape, dtype=np.uint8)
+    buf.flags.writeable = True
+    return buf
+
+
+def compute_landmarks_rgb(
+    image_rgb: np.ndarray,
+    pose: mp_pose.Pose,
+) -> landmark_pb2.NormalizedLandmarkList | None:
+    """Run MediaPipe Pose on an RGB image to compute landmarks."""
+    # To improve performance,
+    # mark the image as not writeable to pass by reference.
+    image_rgb.flags.writeable = False
+    results = pose.process(image_rgb)
+    if not results.pose_landmarks:  # type: ignore
+        return None
+    return results.pose_landmarks  # type: ignore
+
+
 def compute_landmarks(
     image: np.ndarray,
     pose: mp_pose.Pose | None = None,
@@ -127,8 +341,4 @@ def compute_landmarks(
     # mark the image as not writeable to pass by reference.
     image.flags.writeable = False
     image = cv.cvtColor(image, cv.COLOR_BGR2RGB)
-    image.flags.writeable = False
-    results = pose.process(image)
-    if not results.pose_landmarks:  # type: ignore
-        return None
-    return results.pose_landmarks  # type: ignore
+    return compute_landmarks_rgb(image, pose)
@@ -1,12 +1,13 @@
-"""Drawing utilities for landmarks."""
+"""Drawing utilities for landmarks.
 
-from typing import Mapping
+MediaPipe is imported only to build the default drawing specs,
+so that stored landmarks can be drawn without loading it.
+"""
+
+from typing import TYPE_CHECKING, Any, Mapping
 
 import cv2 as cv
 from loguru import logger as lg
-import mediapipe.python.solutions.drawing_styles as mp_drawing_styles
-import mediapipe.python.solutions.drawing_utils as mp_drawing
-import mediapipe.python.solutions.pose as mp_pose
 import numpy as np
 
 from climbing_wire.landmark.landmark_list import LandmarkListImg
@@ -15,17 +16,28 @@ from climbing_wire.utils.mediapipe import (
     get_spec_from_map,
 )
 
+if TYPE_CHECKING:
+    import mediapipe.python.solutions.drawing_utils as mp_drawing
+
+    LandmarkSpecs = mp_drawing.DrawingSpec | Mapping[int, mp_drawing.DrawingSpec]
+    ConnectionSpecs = (
+        mp_drawing.DrawingSpec | Mapping[tuple[int, int], mp_drawing.DrawingSpec]
+    )
+
+# same as mp_drawing._BGR_CHANNELS and mp_drawing.WHITE_COLOR
+BGR_CHANNELS = 3
+WHITE_COLOR = (224, 224, 224)
+
+# marks a drawing spec left to its default, built on first use
+_DEFAULT_SPEC: Any = object()
+
 
 def draw_landmarks(
     image: np.ndarray,
     landmarks: LandmarkListImg,
     pose_connections: list[tuple[int, int]] | None = get_default_pose_connections(),
-    landmark_drawing_spec: mp_drawing.DrawingSpec
-    | Mapping[int, mp_drawing.DrawingSpec]
-    | None = mp_drawing_styles.get_default_pose_landmarks_style(),
-    connection_drawing_spec: mp_drawing.DrawingSpec
-    | Mapping[tuple[int, int], mp_drawing.DrawingSpec]
-    | None = mp_drawing.DrawingSpec(),
+    landmark_drawing_spec: "LandmarkSpecs | None" = _DEFAULT_SPEC,
+    connection_drawing_spec: "ConnectionSpecs | None" = _DEFAULT_SPEC,
 ) -> None:
     """Draw the landmarks and the connections on an image.
 
@@ -43,18 +55,28 @@ def draw_landmarks(
             landmarks to the DrawingSpecs that specifies the landmarks' drawing
             settings such as color, line thickness, and circle radius. If this
             argument is explicitly set to None, no landmarks will be drawn.
+            Defaults to the MediaPipe pose landmarks style.
         connection_drawing_spec: Either a DrawingSpec object or a mapping from hand
             connections to the DrawingSpecs that specifies the connections' drawing
             settings such as color and line thickness. If this argument is explicitly
             set to None, no landmark connections will be drawn.
+            Defaults to the MediaPipe DrawingSpec.
 
     Raises:
         ValueError: If one of the followings:
             a) If the input image is not three channel BGR.
             b) If any connection contains invalid landmark index.
     """
-    if image.shape[2] != mp_drawing._BGR_CHANNELS:
+    if image.shape[2] != BGR_CHANNELS:
         raise ValueError("Input image must contain three channel bgr data.")
+    if landmark_drawing_spec is _DEFAULT_SPEC:
+        import mediapipe.python.solutions.drawing_styles as mp_drawing_styles
+
+        landmark_drawing_spec = mp_drawing_styles.get_default_pose_landmarks_style()
+    if connection_drawing_spec is _DEFAULT_SPEC:
+        import mediapipe.python.solutions.drawing_utils as mp_drawing
+
+        connection_drawing_spec = mp_drawing.DrawingSpec()
     # check that the image and the landmarks are coherent ?
     if not image.shape[:2] == landmarks.img_shape[:2]:
         # raise ValueError("Input image must match landmark image.")
@@ -100,7 +122,7 @@ def draw_landmarks(
                 image,
                 landmark_px,
                 circle_border_radius,
-                mp_drawing.WHITE_COLOR,
+                WHITE_COLOR,
                 drawing_spec.thickness,
             )
             # Fill color into the circle
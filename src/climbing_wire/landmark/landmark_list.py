@@ -1,18 +1,34 @@
 """A LandmarkList as numpy arrays."""
 
-from typing import Literal, Self
+from operator import attrgetter
+from typing import TYPE_CHECKING, Literal, Self, Sequence
 
 from loguru import logger as lg
-from mediapipe.framework.formats import landmark_pb2
 import numpy as np
 
 from climbing_wire.utils.mediapipe import (
+    JOINT_LANDMARKS_MAP,
+    JOINT_NAMES_TYPE,
     POSE_LANDMARKS_MAP,
     POSE_LANDMARKS_NAMES,
     are_valid_normalized_points,
     normalized_to_pixel_coordinates,
 )
 
+if TYPE_CHECKING:
+    from mediapipe.framework.formats import landmark_pb2
+
+# the fields of a landmark, packed by landmarks_to_array
+_get_landmark_fields = attrgetter("x", "y", "z", "visibility")
+
+
+def landmarks_to_array(
+    pose_landmarks: "landmark_pb2.NormalizedLandmarkList",
+) -> np.ndarray:
+    """Convert the landmarks to a (N, 4) array of x, y, z and visibility."""
+    fields = list(map(_get_landmark_fields, pose_landmarks.landmark))  # type: ignore
+    return np.array(fields, dtype=float).reshape(-1, 4)
+
 
 class LandmarkListNp:
     """A LandmarkList as numpy arrays.
@@ -23,7 +39,7 @@ class LandmarkListNp:
 
     def __init__(
         self,
-        pose_landmarks: landmark_pb2.NormalizedLandmarkList,
+        pose_landmarks: "landmark_pb2.NormalizedLandmarkList",
     ) -> None:
         """Create the LandmarkListNp.
 
@@ -31,16 +47,17 @@ class LandmarkListNp:
             pose_landmarks (landmark_pb2.NormalizedLandmarkList): The landmarks.
         """
         # unpack the landmark data
-        landmarks_norm_ls: list[tuple[float, float]] = []
-        visibility_ls: list[float] = []
-        for landmark in pose_landmarks.landmark:  # type: ignore # the NamedTuple complains
-            landmarks_norm_ls.append((landmark.x, landmark.y))
-            visibility_ls.append((landmark.visibility))
-        self.landmarks_norm = np.array(landmarks_norm_ls)
-        self.visibility = np.array(visibility_ls)
-        # so that we can create a copy of this object
-        # meh
-        self.pose_landmarks = pose_landmarks
+        self._set_arrays(landmarks_to_array(pose_landmarks))
+
+    def _set_arrays(self, landmarks: np.ndarray) -> None:
+        """Split a (N, 4) array of x, y, z and visibility in the attributes."""
+        self.landmarks_norm = landmarks[:, :2]
+        self.landmarks_z = landmarks[:, 2]
+        self.visibility = landmarks[:, 3]
+
+    def to_array(self) -> np.ndarray:
+        """Pack the landmarks in a (N, 4) array of x, y, z and visibility."""
+        return np.column_stack((self.landmarks_norm, self.landmarks_z, self.visibility))
 
     def __len__(self) -> int:
         """Return the number of landmarks in the list."""
@@ -59,7 +76,7 @@ class LandmarkListImg(LandmarkListNp):
 
     def __init__(
         self,
-        pose_landmarks: landmark_pb2.NormalizedLandmarkList,
+        pose_landmarks: "landmark_pb2.NormalizedLandmarkList",
         img_shape: tuple[int, int],
         visibility_threshold: float = 0.5,
     ) -> None:
@@ -73,7 +90,59 @@ class LandmarkListImg(LandmarkListNp):
         """
         # convert the landmarks into np arrays
         super().__init__(pose_landmarks)
+        self._set_image_info(img_shape, visibility_threshold)
+
+    @classmethod
+    def from_array(
+        cls,
+        landmarks: np.ndarray,
+        img_shape: tuple[int, int],
+        visibility_threshold: float = 0.5,
+    ) -> Self:
+        """Create the LandmarkListImg from stored arrays, without MediaPipe.
+
+        Args:
+            landmarks: The (N, 4) array of normalized x, y, z and visibility,
+                as returned by to_array.
+            img_shape: Size of the source image.
+            visibility_threshold: Minimum visibility value for a landmark.
+        """
+        lli = cls.__new__(cls)
+        lli._set_arrays(np.array(landmarks, dtype=float))
+        lli._set_image_info(img_shape, visibility_threshold)
+        return lli
+
+    @classmethod
+    def from_columns(
+        cls,
+        landmarks_norm: np.ndarray,
+        landmarks_z: np.ndarray,
+        visibility: np.ndarray,
+        landmarks_img: np.ndarray,
+        drawable: np.ndarray,
+        img_shape: tuple[int, int],
+        visibility_threshold: float = 0.5,
+    ) -> Self:
+        """Create the LandmarkListImg on arrays already computed, without copies.
 
+        Used by LandmarkSequence to expose a frame as a view on its rows.
+        """
+        lli = cls.__new__(cls)
+        lli.landmarks_norm = landmarks_norm
+        lli.landmarks_z = landmarks_z
+        lli.visibility = visibility
+        lli.img_shape = img_shape
+        lli.visibility_threshold = visibility_threshold
+        lli.landmarks_img = landmarks_img
+        lli.drawable = drawable
+        return lli
+
+    def _set_image_info(
+        self,
+        img_shape: tuple[int, int],
+        visibility_threshold: float,
+    ) -> None:
+        """Compute the image coordinates and which landmarks are drawable."""
         # save the configs
         self.img_shape = img_shape
         self.visibility_threshold = visibility_threshold
@@ -124,22 +193,31 @@ class LandmarkListImg(LandmarkListNp):
             * left foot: "LEFT_ANKLE", "LEFT_HEEL", "LEFT_FOOT_INDEX",
             * right foot: "RIGHT_ANKLE", "RIGHT_HEEL", "RIGHT_FOOT_INDEX",
         """
-        if which_landmark == "left_hand":
-            land_idx = POSE_LANDMARKS_MAP["LEFT_WRIST"]
-        elif which_landmark == "right_hand":
-            land_idx = POSE_LANDMARKS_MAP["RIGHT_WRIST"]
-        elif which_landmark == "left_foot":
-            land_idx = POSE_LANDMARKS_MAP["LEFT_ANKLE"]
-        elif which_landmark == "right_foot":
-            land_idx = POSE_LANDMARKS_MAP["RIGHT_ANKLE"]
-
+        land_idx = POSE_LANDMARKS_MAP[JOINT_LANDMARKS_MAP[which_landmark]]
         return self.landmarks_img[land_idx : land_idx + 1, :], self.visibility[land_idx]
 
+    def get_landmarks_for_joints(
+        self,
+        which_landmarks: Sequence[JOINT_NAMES_TYPE],
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Get the positions of several joints, and their visibility values.
+
+        The points will be returned as a Jx2 array, the visibility as a J array.
+        """
+        land_idxs = [
+            POSE_LANDMARKS_MAP[JOINT_LANDMARKS_MAP[j]] for j in which_landmarks
+        ]
+        return self.landmarks_img[land_idxs], self.visibility[land_idxs]
+
     def copy(self) -> Self:
         """Return a copy of the object."""
         # lg.debug("Copying LandmarkListImg.")
-        return LandmarkListImg(
-            self.pose_landmarks,
+        return LandmarkListImg.from_columns(
+            self.landmarks_norm.copy(),
+            self.landmarks_z.copy(),
+            self.visibility.copy(),
+            self.landmarks_img.copy(),
+            self.drawable.copy(),
             self.img_shape,
             self.visibility_threshold,
         )
@@ -0,0 +1,251 @@
+"""The landmarks of a whole video, stored by column.
+
+All the frames are kept in contiguous arrays, so that the history of a landmark
+or the frames where some landmarks are visible are vectorized slices, and the
+landmarks of a single frame are a view on a row.
+"""
+
+from typing import Iterable, Self, Sequence
+
+import numpy as np
+
+from climbing_wire.landmark.cache import LandmarkRecord
+from climbing_wire.landmark.landmark_list import LandmarkListImg
+from climbing_wire.utils.mediapipe import (
+    JOINT_LANDMARKS_MAP,
+    JOINT_NAMES_TYPE,
+    NUM_POSE_LANDMARKS,
+    POSE_LANDMARKS_MAP,
+    are_valid_normalized_points,
+    normalized_to_pixel_coordinates,
+)
+
+
+class LandmarkSequence:
+    """The landmarks of a sequence of frames, in contiguous arrays.
+
+    The arrays are preallocated and double in size when full, so that adding
+    a frame is amortized O(1). The frames where no pose was found are kept,
+    with found set to False.
+    """
+
+    def __init__(
+        self,
+        img_shape: tuple[int, int],
+        visibility_threshold: float = 0.5,
+        capacity: int = 256,
+    ) -> None:
+        """Create an empty LandmarkSequence.
+
+        Args:
+            img_shape: Size of the frames.
+            visibility_threshold: Minimum visibility value for a landmark
+                to be drawable.
+            capacity: Number of frames to preallocate.
+        """
+        self.img_shape = img_shape
+        self.visibility_threshold = visibility_threshold
+        self._len = 0
+        self._alloc(max(capacity, 1))
+
+    def _alloc(self, capacity: int) -> None:
+        """Allocate new buffers, keeping the frames already stored."""
+        L = NUM_POSE_LANDMARKS
+        bufs = {
+            "_norm_buf": np.zeros((capacity, L, 2), float),
+            "_z_buf": np.zeros((capacity, L), float),
+            "_visibility_buf": np.zeros((capacity, L), float),
+            "_img_buf": np.zeros((capacity, L, 2), int),
+            "_drawable_buf": np.zeros((capacity, L), bool),
+            "_found_buf": np.zeros(capacity, bool),
+            "_usecs_buf": np.zeros(capacity, np.int64),
+        }
+        for name, buf in bufs.items():
+            if self._len > 0:
+                buf[: self._len] = getattr(self, name)[: self._len]
+            setattr(self, name, buf)
+
+    @property
+    def capacity(self) -> int:
+        """Number of frames that fit in the buffers."""
+        return len(self._found_buf)
+
+    def _reserve(self, size: int) -> None:
+        """Grow the buffers, doubling them, to hold at least size frames."""
+        if size > self.capacity:
+            self._alloc(max(size, 2 * self.capacity))
+
+    @property
+    def landmarks_norm(self) -> np.ndarray:
+        """The normalized positions, as a (N, 33, 2) view."""
+        return self._norm_buf[: self._len]
+
+    @property
+    def landmarks_z(self) -> np.ndarray:
+        """The normalized depths, as a (N, 33) view."""
+        return self._z_buf[: self._len]
+
+    @property
+    def visibility(self) -> np.ndarray:
+        """The visibility of the landmarks, as a (N, 33) view."""
+        return self._visibility_buf[: self._len]
+
+    @property
+    def landmarks_img(self) -> np.ndarray:
+        """The positions in image coordinates, as a (N, 33, 2) view."""
+        return self._img_buf[: self._len]
+
+    @property
+    def drawable(self) -> np.ndarray:
+        """Whether each landmark is visible and inside the image, (N, 33) view."""
+        return self._drawable_buf[: self._len]
+
+    @property
+    def found(self) -> np.ndarray:
+        """Whether a pose was found in each frame, as a (N,) view."""
+        return self._found_buf[: self._len]
+
+    @property
+    def usecs(self) -> np.ndarray:
+        """The timestamp of each frame in μsec, as a (N,) view."""
+        return self._usecs_buf[: self._len]
+
+    def extend(
+        self,
+        landmarks: np.ndarray,
+        found: np.ndarray,
+        usecs: np.ndarray,
+    ) -> None:
+        """Add many frames at once.
+
+        Args:
+            landmarks: The (F, 33, 4) normalized x, y, z and visibility.
+            found: The (F,) flags of the frames where a pose was found.
+            usecs: The (F,) timestamps of the frames.
+        """
+        F = len(found)
+        self._reserve(self._len + F)
+        new = slice(self._len, self._len + F)
+        found = np.asarray(found, bool)
+        landmarks = np.asarray(landmarks, float)
+
+        norm = landmarks[..., :2].reshape(-1, 2)
+        visibility = landmarks[..., 3]
+        img = normalized_to_pixel_coordinates(norm, self.img_shape)
+        drawable = visibility > self.visibility_threshold
+        drawable &= are_valid_normalized_points(norm).reshape(F, NUM_POSE_LANDMARKS)
+        # nothing to draw where no pose was found
+        drawable &= found[:, None]
+
+        self._norm_buf[new] = landmarks[..., :2]
+        self._z_buf[new] = landmarks[..., 2]
+        self._visibility_buf[new] = visibility
+        self._img_buf[new] = img.reshape(F, NUM_POSE_LANDMARKS, 2)
+        self._drawable_buf[new] = drawable
+        self._found_buf[new] = found
+        self._usecs_buf[new] = usecs
+        self._len += F
+
+    def append(
+        self,
+        landlist: LandmarkListImg | None,
+        usec: int,
+    ) -> None:
+        """Add a frame, landlist is None if no pose was found."""
+        landmarks = np.zeros((1, NUM_POSE_LANDMARKS, 4))
+        if landlist is not None:
+            landmarks[0] = landlist.to_array()
+        self.extend(landmarks, np.array([landlist is not None]), np.array([usec]))
+
+    @classmethod
+    def from_record(
+        cls,
+        record: LandmarkRecord,
+        visibility_threshold: float = 0.5,
+    ) -> Self:
+        """Create the sequence from the landmarks stored in a LandmarkRecord."""
+        seq = cls(record.img_shape, visibility_threshold, len(record))
+        seq.extend(record.landmarks, record.found, record.usecs)
+        return seq
+
+    @classmethod
+    def from_landlists(
+        cls,
+        landlists: Iterable[LandmarkListImg | None],
+        usecs: Iterable[int],
+        img_shape: tuple[int, int],
+        visibility_threshold: float = 0.5,
+    ) -> Self:
+        """Create the sequence from the landmarks of each frame."""
+        seq = cls(img_shape, visibility_threshold)
+        for landlist, usec in zip(landlists, usecs):
+            seq.append(landlist, usec)
+        return seq
+
+    def to_record(self) -> LandmarkRecord:
+        """Pack the sequence in a LandmarkRecord, to store it."""
+        landmarks = np.concatenate(
+            (
+                self.landmarks_norm,
+                self.landmarks_z[..., None],
+                self.visibility[..., None],
+            ),
+            axis=-1,
+        ).astype(np.float32)
+        return LandmarkRecord(
+            landmarks, self.found.copy(), self.usecs.copy(), self.img_shape
+        )
+
+    def __len__(self) -> int:
+        """Return the number of frames."""
+        return self._len
+
+    def __getitem__(self, i: int) -> LandmarkListImg | None:
+        """Get the landmarks of a frame as a view, None if no pose was found."""
+        if i < 0:
+            i += self._len
+        if not 0 <= i < self._len:
+            raise IndexError("Frame index out of range.")
+        if not self._found_buf[i]:
+            return None
+        return LandmarkListImg.from_columns(
+            self._norm_buf[i],
+            self._z_buf[i],
+            self._visibility_buf[i],
+            self._img_buf[i],
+            self._drawable_buf[i],
+            self.img_shape,
+            self.visibility_threshold,
+        )
+
+    @staticmethod
+    def landmark_idxs(which_landmarks: Sequence[str]) -> list[int]:
+        """Get the indexes of landmarks or joints, by name.
+
+        Both landmark names, e.g. "LEFT_WRIST", and joint names,
+        e.g. "left_hand", are accepted.
+        """
+        return [
+            POSE_LANDMARKS_MAP[JOINT_LANDMARKS_MAP.get(name, name)]  # type: ignore
+            for name in which_landmarks
+        ]
+
+    def track(self, which_landmark: str) -> np.ndarray:
+        """The image positions of a landmark or joint over time, (N, 2) view."""
+        return self.landmarks_img[:, self.landmark_idxs([which_landmark])[0]]
+
+    def joint_track(
+        self,
+        which_joint: JOINT_NAMES_TYPE,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """The image positions and the visibility of a joint over time."""
+        idx = self.landmark_idxs([which_joint])[0]
+        return self.landmarks_img[:, idx], self.visibility[:, idx]
+
+    def visible(self, which_landmarks: Sequence[str]) -> np.ndarray:
+        """Whether all the landmarks are drawable in each frame, as (N,) bool."""
+        return self.drawable[:, self.landmark_idxs(which_landmarks)].all(axis=1)
+
+    def frames_where_visible(self, which_landmarks: Sequence[str]) -> np.ndarray:
+        """The indexes of the frames where all the landmarks are drawable."""
+        return np.flatnonzero(self.visible(which_landmarks))
@@ -0,0 +1,187 @@
+"""Compute landmarks on many frames with a pool of MediaPipe Pose workers.
+
+Each worker process owns its own PoseImg.
+The frames are shared with the workers through shared memory.
+The workers are spawned, as forking a process that already created a PoseImg
+can hang or abort in the MediaPipe threads.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
+from typing import Any, Self, Sequence
+
+import numpy as np
+
+from climbing_wire.landmark.compute import PoseImg
+from climbing_wire.landmark.landmark_list import LandmarkListImg
+from climbing_wire.video.shared_frames import attach_frames, share_frames
+
+# the state of each worker process, set by _init_worker
+_worker_state: dict[str, Any] = {}
+
+
+def _init_worker(pose_img_kwargs: dict[str, Any]) -> None:
+    """Save the PoseImg config of the worker."""
+    _worker_state.update(pose_img_kwargs=pose_img_kwargs, pose_img=None)
+
+
+def _process_frames(
+    spec: dict[str, Any],
+    indices: list[int],
+    warmup: int,
+) -> list[np.ndarray | None]:
+    """Compute the landmarks of some frames, in a worker.
+
+    In video mode a new PoseImg is created for each task, so that the tracking
+    starts fresh on each chunk: the first warmup frames only prime the
+    tracking, and their results are dropped.
+
+    Returns:
+        The (33, 4) landmarks of each frame after the warmup,
+        None where no pose was found.
+    """
+    kwargs = _worker_state["pose_img_kwargs"]
+    static = kwargs.get("static_image_mode", False)
+    pose_img = _worker_state["pose_img"]
+    if pose_img is None or not static:
+        if pose_img is not None:
+            pose_img.close()
+        pose_img = PoseImg(**kwargs)
+        _worker_state["pose_img"] = pose_img
+
+    shm, frames = attach_frames(spec)
+    try:
+        results: list[np.ndarray | None] = []
+        for i in indices:
+            lli = pose_img(frames[i])
+            results.append(None if lli is None else lli.to_array())
+    finally:
+        del frames
+        shm.close()
+    return results[warmup:]
+
+
+class PoseImgPool:
+    """Compute the landmarks of many frames in parallel.
+
+    In static_image_mode the frames are distributed round-robin to the workers.
+    In video mode the frames are split into contiguous chunks, one per worker,
+    and each chunk is preceded by some overlapping frames to prime the
+    temporal smoothing of the tracker.
+    The last frames of each call prime the first chunk of the next one,
+    so a clip can be processed in batches: call reset before a new clip.
+    """
+
+    def __init__(
+        self,
+        num_workers: int | None = None,
+        chunk_overlap: int = 15,
+        **pose_img_kwargs: Any,
+    ) -> None:
+        """Create the pool.
+
+        Args:
+            num_workers: Number of worker processes. Defaults to the cpu count.
+            chunk_overlap: In video mode, number of frames before each chunk
+                used only to prime the tracking.
+            pose_img_kwargs: Arguments for the PoseImg of each worker.
+        """
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.chunk_overlap = chunk_overlap
+        self.pose_img_kwargs = pose_img_kwargs
+        self.static_image_mode = pose_img_kwargs.get("static_image_mode", False)
+        self.visibility_threshold = pose_img_kwargs.get("visibility_threshold", 0.5)
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.num_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(pose_img_kwargs,),
+        )
+        # in video mode, the last frames of the previous call
+        self._prime_frames: list[np.ndarray] = []
+
+    def _split_tasks(
+        self,
+        num_frames: int,
+        num_prime: int = 0,
+    ) -> list[tuple[list[int], int]]:
+        """Split the frames into tasks, as (indices, warmup) pairs.
+
+        Args:
+            num_frames: Number of frames to compute the landmarks of.
+            num_prime: Number of frames before them, only used to prime
+                the tracking of the first chunk.
+        """
+        if self.static_image_mode:
+            return [
+                (list(range(k, num_frames, self.num_workers)), 0)
+                for k in range(min(self.num_workers, num_frames))
+            ]
+        bounds = np.linspace(0, num_frames, self.num_workers + 1).astype(int)
+        tasks = []
+        for start, end in zip(bounds[:-1] + num_prime, bounds[1:] + num_prime):
+            if start == end:
+                continue
+            first = max(start - self.chunk_overlap, 0)
+            tasks.append((list(range(first, end)), start - first))
+        return tasks
+
+    def __call__(
+        self,
+        frames: Sequence[np.ndarray],
+    ) -> list[LandmarkListImg | None]:
+        """Compute the landmarks of the frames, in image coordinates.
+
+        All the frames must have the same shape.
+        They are copied once in shared memory, so for long videos call this
+        on consecutive batches of frames.
+
+        Returns:
+            The landmarks of each frame, in frame order, None where no pose
+            was found.
+        """
+        if len(frames) == 0:
+            return []
+        prime = self._prime_frames
+        if prime and prime[0].shape != frames[0].shape:
+            prime = []
+        shm, spec = share_frames([*prime, *frames])
+        try:
+            futures = []
+            for indices, warmup in self._split_tasks(len(frames), len(prime)):
+                future = self.executor.submit(_process_frames, spec, indices, warmup)
+                futures.append((indices[warmup:], future))
+            results: list[LandmarkListImg | None] = [None] * len(frames)
+            img_shape = frames[0].shape[:2]
+            for indices, future in futures:
+                for i, lms in zip(indices, future.result()):
+                    if lms is None:
+                        continue
+                    results[i - len(prime)] = LandmarkListImg.from_array(
+                        lms, img_shape, self.visibility_threshold
+                    )
+        finally:
+            shm.close()
+            shm.unlink()
+        if not self.static_image_mode and self.chunk_overlap > 0:
+            # copy them, the caller might reuse the buffers
+            last = [*prime, *frames][-self.chunk_overlap :]
+            self._prime_frames = [np.array(frame) for frame in last]
+        return results
+
+    def reset(self) -> None:
+        """Forget the previous frames, the next call starts a new clip."""
+        self._prime_frames = []
+
+    def close(self) -> None:
+        """Stop the workers."""
+        self.executor.shutdown()
+
+    def __enter__(self) -> Self:
+        """Enter the context."""
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        """Exit the context."""
+        self.close()
@@ -1,5 +1,6 @@
 """Utility functions for the whole package."""
 
+import hashlib
 from pathlib import Path
 from typing import Literal
 
@@ -21,3 +22,22 @@ def get_package_fol(
         return root_fol
     elif which_fol == "sample_square":
         return root_fol / "data" / "sample_square"
+
+
+def file_fingerprint(
+    file_path: Path,
+    chunk_size: int = 2**20,
+) -> str:
+    """Get a cheap fingerprint of a file, e.g. a video.
+
+    Hash the size with the first and last chunks of the file,
+    rather than the whole content.
+    """
+    size = file_path.stat().st_size
+    h = hashlib.sha1(str(size).encode())
+    with file_path.open("rb") as f:
+        h.update(f.read(chunk_size))
+        if size > chunk_size:
+            f.seek(max(size - chunk_size, chunk_size))
+            h.update(f.read(chunk_size))
+    return h.hexdigest()
@@ -1,21 +1,111 @@
-"""Misc utils for landmark detection."""
+"""Misc utils for landmark detection.
+
+The pose landmarks and connections are the ones of MediaPipe Pose,
+defined here so that stored landmarks can be used without importing MediaPipe.
+"""
 
 from enum import IntEnum
-from typing import Literal, Mapping, TypeVar, cast, get_args
+from typing import TYPE_CHECKING, Literal, Mapping, TypeVar, cast, get_args
 
-import mediapipe.python.solutions.drawing_styles as mp_drawing_styles
-import mediapipe.python.solutions.drawing_utils as mp_drawing
-import mediapipe.python.solutions.pose as mp_pose
 import numpy as np
 
+if TYPE_CHECKING:
+    import mediapipe.python.solutions.drawing_utils as mp_drawing
+
 T = TypeVar("T")
 
-POSE_LANDMARKS_NAMES = mp_pose.PoseLandmark._member_names_
-POSE_LANDMARKS_MAP = cast(dict[str, IntEnum], mp_pose.PoseLandmark._member_map_)
+# same as mp_pose.PoseLandmark
+POSE_LANDMARKS_NAMES = [
+    "NOSE",
+    "LEFT_EYE_INNER",
+    "LEFT_EYE",
+    "LEFT_EYE_OUTER",
+    "RIGHT_EYE_INNER",
+    "RIGHT_EYE",
+    "RIGHT_EYE_OUTER",
+    "LEFT_EAR",
+    "RIGHT_EAR",
+    "MOUTH_LEFT",
+    "MOUTH_RIGHT",
+    "LEFT_SHOULDER",
+    "RIGHT_SHOULDER",
+    "LEFT_ELBOW",
+    "RIGHT_ELBOW",
+    "LEFT_WRIST",
+    "RIGHT_WRIST",
+    "LEFT_PINKY",
+    "RIGHT_PINKY",
+    "LEFT_INDEX",
+    "RIGHT_INDEX",
+    "LEFT_THUMB",
+    "RIGHT_THUMB",
+    "LEFT_HIP",
+    "RIGHT_HIP",
+    "LEFT_KNEE",
+    "RIGHT_KNEE",
+    "LEFT_ANKLE",
+    "RIGHT_ANKLE",
+    "LEFT_HEEL",
+    "RIGHT_HEEL",
+    "LEFT_FOOT_INDEX",
+    "RIGHT_FOOT_INDEX",
+]
+PoseLandmark = IntEnum("PoseLandmark", POSE_LANDMARKS_NAMES, start=0)
+POSE_LANDMARKS_MAP = cast(dict[str, IntEnum], PoseLandmark._member_map_)
+NUM_POSE_LANDMARKS = len(POSE_LANDMARKS_NAMES)
+
+# same as mp_pose.POSE_CONNECTIONS
+POSE_CONNECTIONS = frozenset(
+    [
+        (0, 1),
+        (1, 2),
+        (2, 3),
+        (3, 7),
+        (0, 4),
+        (4, 5),
+        (5, 6),
+        (6, 8),
+        (9, 10),
+        (11, 12),
+        (11, 13),
+        (13, 15),
+        (15, 17),
+        (15, 19),
+        (15, 21),
+        (17, 19),
+        (12, 14),
+        (14, 16),
+        (16, 18),
+        (16, 20),
+        (16, 22),
+        (18, 20),
+        (11, 23),
+        (12, 24),
+        (23, 24),
+        (23, 25),
+        (24, 26),
+        (25, 27),
+        (26, 28),
+        (27, 29),
+        (28, 30),
+        (29, 31),
+        (30, 32),
+        (27, 31),
+        (28, 32),
+    ]
+)
 
 JOINT_NAMES_TYPE = Literal["left_hand", "right_hand", "left_foot", "right_foot"]
 JOINT_NAMES = get_args(JOINT_NAMES_TYPE)
 
+# landmark used as position of each joint
+JOINT_LANDMARKS_MAP: dict[JOINT_NAMES_TYPE, str] = {
+    "left_hand": "LEFT_WRIST",
+    "right_hand": "RIGHT_WRIST",
+    "left_foot": "LEFT_ANKLE",
+    "right_foot": "RIGHT_ANKLE",
+}
+
 
 def normalized_to_pixel_coordinates(
     normalized_points: np.ndarray,
@@ -56,9 +146,9 @@ def are_valid_normalized_points(points: np.ndarray) -> np.ndarray:
 
 
 def get_spec_from_map(
-    drawing_spec: mp_drawing.DrawingSpec | Mapping[T, mp_drawing.DrawingSpec],
+    drawing_spec: "mp_drawing.DrawingSpec | Mapping[T, mp_drawing.DrawingSpec]",
     key: T,
-) -> mp_drawing.DrawingSpec:
+) -> "mp_drawing.DrawingSpec":
     """Extract a DrawingSpec from a Mapping or return the DrawingSpec itself."""
     if isinstance(drawing_spec, Mapping):
         return drawing_spec[key]
@@ -70,5 +160,5 @@ def get_default_pose_connections() -> list[tuple[int, int]]:
 
     Cast the connections to a list of tuples for the sake of type checking.
     """
-    pose_connections = cast(list[tuple[int, int]], mp_pose.POSE_CONNECTIONS)
+    pose_connections = cast(list[tuple[int, int]], POSE_CONNECTIONS)
     return pose_connections
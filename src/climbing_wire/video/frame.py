@@ -3,18 +3,79 @@
 With a timestamp and an index.
 """
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import Callable, Hashable
 
+import cv2 as cv
 import numpy as np
 
 
+def _rescale(img: np.ndarray, scale: float) -> np.ndarray:
+    """Rescale an image by a factor."""
+    interpolation = cv.INTER_AREA if scale < 1 else cv.INTER_LINEAR
+    return cv.resize(img, None, fx=scale, fy=scale, interpolation=interpolation)
+
+
 @dataclass
 class Frame:
-    """A frame is a video frame."""
+    """A frame is a video frame.
+
+    The source identifies the video the frame comes from, e.g. its
+    fingerprint, None if unknown.
+
+    The grayscale and rescaled variants of the frame are built when first
+    requested, and cached on the object. They must not be modified in place.
+    """
 
     frame: np.ndarray
     usec: int
     idx: int
+    source: str | None = None
+    _variants: dict[Hashable, np.ndarray] = field(
+        default_factory=dict, repr=False, compare=False
+    )
+
+    def gray(self, scale: float = 1.0) -> np.ndarray:
+        """Get the frame in grayscale, optionally rescaled.
+
+        The frame is converted to grayscale before being rescaled.
+        """
+        key = ("gray", scale)
+        if key not in self._variants:
+            if scale != 1.0:
+                img = _rescale(self.gray(), scale)
+            elif self.frame.ndim == 3:
+                img = cv.cvtColor(self.frame, cv.COLOR_BGR2GRAY)
+            else:
+                img = self.frame
+            self._variants[key] = img
+        return self._variants[key]
+
+    def resized(self, scale: float) -> np.ndarray:
+        """Get the frame rescaled by a factor."""
+        if scale == 1.0:
+            return self.frame
+        key = ("color", scale)
+        if key not in self._variants:
+            self._variants[key] = _rescale(self.frame, scale)
+        return self._variants[key]
+
+    def variant(
+        self,
+        key: Hashable,
+        build: Callable[["Frame"], np.ndarray],
+    ) -> np.ndarray:
+        """Get a variant of the frame, built with build(frame) on first use.
+
+        The key must identify both the kind of variant and its parameters.
+        """
+        if key not in self._variants:
+            self._variants[key] = build(self)
+        return self._variants[key]
+
+    def clear_variants(self) -> None:
+        """Drop the cached variants, e.g. after modifying the frame."""
+        self._variants.clear()
 
     def __str__(self) -> str:
         """Return the string representation of a frame."""
@@ -0,0 +1,91 @@
+"""Cheap distances between frames.
+
+Useful at the coarse levels of fastdtw, where the frames only need to be
+roughly aligned, before running the full homography at the final level.
+
+fastdtw compares each frame with many others, so the thumbnails and the
+histograms are computed once per frame, and cached on the Frame.
+"""
+
+import cv2 as cv
+import numpy as np
+
+from climbing_wire.video.frame import Frame
+
+
+def thumbnail(
+    img: np.ndarray,
+    size: int = 32,
+) -> np.ndarray:
+    """Shrink an image to a square grayscale thumbnail, as float."""
+    if img.ndim == 3:
+        img = cv.cvtColor(img, cv.COLOR_BGR2GRAY)
+    img = cv.resize(img, (size, size), interpolation=cv.INTER_AREA)
+    return img.astype(np.float32)
+
+
+def frame_thumbnail(
+    f: Frame,
+    size: int = 32,
+) -> np.ndarray:
+    """Get the thumbnail of a frame, cached on the frame."""
+    return f.variant(("thumbnail", size), lambda f: thumbnail(f.gray(), size))
+
+
+def hs_histogram(
+    img: np.ndarray,
+    bins: int = 32,
+) -> np.ndarray:
+    """Get the normalized hue-saturation histogram of a BGR image."""
+    hsv = cv.cvtColor(img, cv.COLOR_BGR2HSV)
+    hist = cv.calcHist([hsv], [0, 1], None, [bins, bins], [0, 180, 0, 256])
+    cv.normalize(hist, hist, 1, 0, cv.NORM_L1)
+    return hist
+
+
+def frame_hs_histogram(
+    f: Frame,
+    bins: int = 32,
+) -> np.ndarray:
+    """Get the hue-saturation histogram of a frame, cached on the frame."""
+    return f.variant(("hs_histogram", bins), lambda f: hs_histogram(f.frame, bins))
+
+
+def thumbnail_distance(
+    f1: Frame,
+    f2: Frame,
+    size: int = 32,
+) -> float:
+    """Mean squared difference of the grayscale thumbnails of two frames."""
+    t1 = frame_thumbnail(f1, size)
+    t2 = frame_thumbnail(f2, size)
+    return float(((t1 - t2) ** 2).mean())
+
+
+def correlation_distance(
+    f1: Frame,
+    f2: Frame,
+    size: int = 64,
+) -> float:
+    """One minus the normalized correlation of the downscaled grayscale frames.
+
+    Insensitive to global changes in brightness and contrast.
+    """
+    t1 = frame_thumbnail(f1, size)
+    t2 = frame_thumbnail(f2, size)
+    corr = cv.matchTemplate(t1, t2, cv.TM_CCOEFF_NORMED)[0, 0]
+    return float(1 - corr)
+
+
+def histogram_distance(
+    f1: Frame,
+    f2: Frame,
+    bins: int = 32,
+) -> float:
+    """Bhattacharyya distance between the hue-saturation histograms of two frames.
+
+    Ignores the geometry of the frames completely.
+    """
+    h1 = frame_hs_histogram(f1, bins)
+    h2 = frame_hs_histogram(f2, bins)
+    return float(cv.compareHist(h1, h2, cv.HISTCMP_BHATTACHARYYA))
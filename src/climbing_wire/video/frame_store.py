@@ -0,0 +1,184 @@
+"""Store the decoded frames of a video in a memory-mapped file.
+
+The frames are written once in a single raw file, next to an index of their
+timestamps and a json file describing how they were extracted.
+Opening the store maps the file in memory, so the frames are read from disk
+only when used, and the same store can be reused across runs and opened by
+worker processes.
+"""
+
+from dataclasses import asdict
+import json
+from pathlib import Path
+from typing import Any, Sequence, overload
+
+import numpy as np
+
+from climbing_wire.utils.data import file_fingerprint
+from climbing_wire.video.frame import Frame
+from climbing_wire.video.load import (
+    iterate_video_frames_with_timestamp,
+    prefetch_video_frames_with_timestamp,
+    video_frame_source,
+)
+from climbing_wire.video.transform import FrameTransform
+
+FRAMES_FILE = "frames.bin"
+INDEX_FILE = "index.npy"
+META_FILE = "meta.json"
+
+
+class FrameStore(Sequence[Frame]):
+    """A sequence of frames backed by a memory-mapped file.
+
+    Indexing returns Frame objects whose frame is a read-only view on the file.
+    The store can be pickled cheaply: the file is mapped again on first use.
+    """
+
+    def __init__(self, store_fol: Path) -> None:
+        """Open an existing store.
+
+        Args:
+            store_fol: The folder of the store, see FrameStore.build.
+
+        Raises:
+            FileNotFoundError: If the store is missing or incomplete.
+        """
+        self.store_fol = store_fol
+        meta_path = store_fol / META_FILE
+        if not meta_path.exists():
+            raise FileNotFoundError(f"No complete frame store in {store_fol}.")
+        self.meta: dict[str, Any] = json.loads(meta_path.read_text())
+        index = np.load(store_fol / INDEX_FILE)
+        self.usecs: np.ndarray = index[:, 0]
+        self.idxs: np.ndarray = index[:, 1]
+        self._frames: np.memmap | None = None
+
+    @property
+    def frames(self) -> np.memmap:
+        """All the frames, as a (N, H, W[, C]) read-only memory map."""
+        if self._frames is None:
+            shape = tuple(self.meta["shape"])
+            if shape[0] == 0:
+                # an empty file cannot be mapped
+                return np.empty(shape, dtype=self.meta["dtype"])  # type: ignore
+            self._frames = np.memmap(
+                self.store_fol / FRAMES_FILE,
+                dtype=np.dtype(self.meta["dtype"]),
+                mode="r",
+                shape=shape,
+            )
+        return self._frames
+
+    @classmethod
+    def build(
+        cls,
+        in_vid_path: Path,
+        store_fol: Path,
+        keep_every_nth_frame: int = 1,
+        max_frame_count: int = 0,
+        transform: FrameTransform | None = None,
+        prefetch: bool = True,
+        overwrite: bool = False,
+    ) -> "FrameStore":
+        """Decode a video in a new store, or open the store if already built.
+
+        An existing store is reused only if it was built from the same video
+        with the same arguments.
+
+        Args:
+            in_vid_path: Input video file.
+            store_fol: The folder of the store, created if missing.
+            keep_every_nth_frame: Keep every nth frame.
+            max_frame_count: Maximum number of frames to store, 0 for all.
+            transform: Optional transform applied to each frame after decoding,
+                e.g. to store downscaled frames.
+            prefetch: Decode the frames on a background thread.
+            overwrite: Build the store again even if it exists.
+        """
+        config = {
+            "video": file_fingerprint(in_vid_path),
+            "keep_every_nth_frame": keep_every_nth_frame,
+            "max_frame_count": max_frame_count,
+            "transform": asdict(transform) if transform is not None else None,
+        }
+        # normalize the tuples in the transform, to compare with the json
+        config = json.loads(json.dumps(config))
+        meta_path = store_fol / META_FILE
+        if not overwrite and meta_path.exists():
+            store = cls(store_fol)
+            if store.meta["config"] == config:
+                return store
+
+        # the meta file marks a complete store, remove it while writing
+        store_fol.mkdir(parents=True, exist_ok=True)
+        meta_path.unlink(missing_ok=True)
+
+        iterate_frames = (
+            prefetch_video_frames_with_timestamp
+            if prefetch
+            else iterate_video_frames_with_timestamp
+        )
+        index: list[tuple[int, int]] = []
+        frame_shape: tuple[int, ...] = ()
+        dtype = np.dtype(np.uint8)
+        with (store_fol / FRAMES_FILE).open("wb") as f:
+            for frame, usec in iterate_frames(
+                in_vid_path,
+                keep_every_nth_frame=keep_every_nth_frame,
+                transform=transform,
+            ):
+                if not index:
+                    frame_shape, dtype = frame.shape, frame.dtype
+                f.write(np.ascontiguousarray(frame).data)
+                index.append((usec, len(index)))
+                if max_frame_count > 0 and len(index) >= max_frame_count:
+                    break
+
+        index_arr = np.array(index, dtype=np.int64).reshape(-1, 2)
+        np.save(store_fol / INDEX_FILE, index_arr)
+        meta = {
+            "config": config,
+            "shape": [len(index), *frame_shape],
+            "dtype": dtype.str,
+            "source": video_frame_source(in_vid_path, transform),
+        }
+        meta_path.write_text(json.dumps(meta, indent=4))
+        return cls(store_fol)
+
+    def __len__(self) -> int:
+        """Return the number of frames in the store."""
+        return len(self.usecs)
+
+    @overload
+    def __getitem__(self, i: int) -> Frame:
+        ...
+
+    @overload
+    def __getitem__(self, i: slice) -> list[Frame]:
+        ...
+
+    def __getitem__(self, i: int | slice) -> Frame | list[Frame]:
+        """Get a frame, or a list of frames, as views on the file."""
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("Frame index out of range.")
+        return Frame(
+            frame=self.frames[i],
+            usec=int(self.usecs[i]),
+            idx=int(self.idxs[i]),
+            source=self.meta.get("source"),
+        )
+
+    def __getstate__(self) -> dict[str, Any]:
+        """Get the state to pickle, without the memory map."""
+        state = self.__dict__.copy()
+        state["_frames"] = None
+        return state
+
+    def __repr__(self) -> str:
+        """Return the representation of the store."""
+        return f"FrameStore({self.store_fol}, {len(self)} frames)"
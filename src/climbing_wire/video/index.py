@@ -0,0 +1,282 @@
+"""Index the frames of a video, for random access by index or timestamp.
+
+The index maps each frame to its presentation timestamp and to the nearest
+preceding keyframe. It is built once, reading the packets of the video
+without decoding them, and saved next to the video.
+The packets come in decode order: with B-frames their timestamps are not
+sorted, so they are sorted in presentation order, with their keyframe flags.
+
+A VideoFrameReader uses the index to get arbitrary frames: it seeks to the
+keyframe before each requested frame, and decodes forward only as needed.
+"""
+
+from pathlib import Path
+from typing import Any, Iterable, Self
+
+import cv2 as cv
+from loguru import logger as lg
+import numpy as np
+
+from climbing_wire.utils.data import file_fingerprint
+from climbing_wire.video.frame import Frame
+
+
+def default_index_path(in_vid_path: Path) -> Path:
+    """The path of the index saved next to a video."""
+    return in_vid_path.with_name(f"{in_vid_path.name}.index.npz")
+
+
+def presentation_order(
+    usecs: np.ndarray,
+    is_key: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Sort the packets of a video from decode order to presentation order.
+
+    Args:
+        usecs: The presentation timestamp of each packet, in decode order.
+        is_key: Whether each packet is a keyframe, in decode order.
+
+    Returns:
+        The sorted timestamps, and the index of the nearest keyframe at or
+        before each frame, in presentation order.
+    """
+    order = np.argsort(usecs, kind="stable")
+    usecs = usecs[order]
+    is_key = is_key[order]
+    frame_idxs = np.arange(len(usecs))
+    key_idxs = np.where(is_key, frame_idxs, 0)
+    if len(key_idxs) > 0:
+        key_idxs = np.maximum.accumulate(key_idxs)
+    return usecs, key_idxs
+
+
+def read_packets(in_vid_path: Path) -> tuple[np.ndarray, np.ndarray]:
+    """Read the timestamps and the keyframe flags of the packets of a video.
+
+    Returns:
+        The timestamp in μsec and whether it is a keyframe, for each packet,
+        in decode order.
+    """
+    cap = cv.VideoCapture(str(in_vid_path))
+    try:
+        # read the raw packets, to get the keyframe flags
+        raw = cap.set(cv.CAP_PROP_FORMAT, -1)
+        if not raw:
+            lg.warning("Cannot read raw packets, assuming all keyframes.")
+        usecs: list[int] = []
+        is_key: list[bool] = []
+        while cap.grab():
+            usecs.append(int(cap.get(cv.CAP_PROP_POS_MSEC) * 1000))
+            is_key.append(not raw or cap.get(cv.CAP_PROP_LRF_HAS_KEY_FRAME) != 0)
+    finally:
+        cap.release()
+    return np.array(usecs, dtype=np.int64), np.array(is_key, dtype=bool)
+
+
+def read_frame_usecs(in_vid_path: Path) -> np.ndarray:
+    """Read the timestamp in μsec of each frame, decoding the video."""
+    cap = cv.VideoCapture(str(in_vid_path))
+    try:
+        usecs: list[int] = []
+        while cap.grab():
+            usecs.append(int(cap.get(cv.CAP_PROP_POS_MSEC) * 1000))
+    finally:
+        cap.release()
+    return np.array(usecs, dtype=np.int64)
+
+
+class VideoIndex:
+    """The timestamps and the keyframes of the frames of a video.
+
+    Attributes:
+        usecs: The timestamp in μsec of each frame.
+        key_idxs: The index of the nearest keyframe at or before each frame.
+        fingerprint: The fingerprint of the video file.
+    """
+
+    def __init__(
+        self,
+        usecs: np.ndarray,
+        key_idxs: np.ndarray,
+        fingerprint: str,
+    ) -> None:
+        """Create the VideoIndex, see build and load_or_build.
+
+        Raises:
+            ValueError: If the timestamps are not strictly increasing.
+        """
+        if np.any(np.diff(usecs) <= 0):
+            raise ValueError("The frame timestamps must be strictly increasing.")
+        self.usecs = usecs
+        self.key_idxs = key_idxs
+        self.fingerprint = fingerprint
+
+    @classmethod
+    def build(cls, in_vid_path: Path) -> Self:
+        """Index a video, reading its packets without decoding them.
+
+        If the packets have no distinct timestamps, the timestamps are read
+        decoding the video, and only the first frame is used as keyframe.
+
+        Raises:
+            ValueError: If the frames have no distinct timestamps.
+        """
+        usecs, is_key = read_packets(in_vid_path)
+        if len(np.unique(usecs)) < len(usecs):
+            lg.warning("Missing packet timestamps, decoding the video to index it.")
+            usecs = read_frame_usecs(in_vid_path)
+            is_key = np.zeros(len(usecs), dtype=bool)
+        usecs, key_idxs = presentation_order(usecs, is_key)
+        return cls(usecs, key_idxs, file_fingerprint(in_vid_path))
+
+    @classmethod
+    def load(cls, index_path: Path) -> Self:
+        """Load an index saved with save."""
+        with np.load(index_path) as data:
+            return cls(data["usecs"], data["key_idxs"], str(data["fingerprint"]))
+
+    def save(self, index_path: Path) -> None:
+        """Save the index."""
+        with index_path.open("wb") as f:
+            np.savez(
+                f,
+                usecs=self.usecs,
+                key_idxs=self.key_idxs,
+                fingerprint=np.array(self.fingerprint),
+            )
+
+    @classmethod
+    def load_or_build(
+        cls,
+        in_vid_path: Path,
+        index_path: Path | None = None,
+    ) -> Self:
+        """Load the index of a video, building and saving it if needed.
+
+        The saved index is rebuilt if the video changed.
+
+        Args:
+            in_vid_path: Input video file.
+            index_path: Where to save the index. Defaults to next to the video.
+        """
+        if index_path is None:
+            index_path = default_index_path(in_vid_path)
+        if index_path.exists():
+            try:
+                index = cls.load(index_path)
+            except ValueError:
+                lg.info(f"Invalid index, rebuilding the index {index_path}")
+            else:
+                if index.fingerprint == file_fingerprint(in_vid_path):
+                    return index
+                lg.info(f"Video changed, rebuilding the index {index_path}")
+        index = cls.build(in_vid_path)
+        index.save(index_path)
+        return index
+
+    def frame_at_usec(self, usec: int) -> int:
+        """Index of the frame with the timestamp nearest to usec."""
+        i = int(np.searchsorted(self.usecs, usec))
+        if i == len(self.usecs):
+            return i - 1
+        if i > 0 and usec - self.usecs[i - 1] <= self.usecs[i] - usec:
+            return i - 1
+        return i
+
+    @property
+    def keyframes(self) -> np.ndarray:
+        """The indexes of the keyframes."""
+        return np.unique(self.key_idxs)
+
+    def __len__(self) -> int:
+        """Return the number of frames in the video."""
+        return len(self.usecs)
+
+
+class VideoFrameReader:
+    """Get arbitrary frames of a video, using its index to seek.
+
+    The requested frames are sorted, and the video is decoded forward from
+    the current position when no keyframe is closer to the next frame,
+    else it seeks to the keyframe before it.
+    """
+
+    def __init__(
+        self,
+        in_vid_path: Path,
+        index: VideoIndex | None = None,
+    ) -> None:
+        """Open the video.
+
+        Args:
+            in_vid_path: Input video file.
+            index: The index of the video. Defaults to the one saved next to
+                the video, built if missing.
+        """
+        self.in_vid_path = in_vid_path
+        self.index = (
+            index if index is not None else VideoIndex.load_or_build(in_vid_path)
+        )
+        self.cap = cv.VideoCapture(str(in_vid_path))
+        # index of the next frame that grab would return
+        self.next_idx = 0
+        self.seek_count = 0
+
+    def _seek(self, idx: int) -> None:
+        """Move the capture so that the next grab returns frame idx."""
+        key_idx = int(self.index.key_idxs[idx])
+        if not key_idx <= self.next_idx <= idx:
+            # the keyframe is closer than the current position
+            self.cap.set(cv.CAP_PROP_POS_FRAMES, key_idx)
+            self.next_idx = key_idx
+            self.seek_count += 1
+        while self.next_idx < idx:
+            if not self.cap.grab():
+                raise ValueError(f"Cannot read frame {self.next_idx}.")
+            self.next_idx += 1
+
+    def get_frames(self, indices: Iterable[int]) -> list[Frame]:
+        """Get the frames at the given indices, in the requested order.
+
+        Raises:
+            IndexError: If an index is outside the video.
+            ValueError: If a frame cannot be decoded.
+        """
+        indices = list(indices)
+        decoded: dict[int, Frame] = {}
+        for idx in sorted(set(indices)):
+            if not 0 <= idx < len(self.index):
+                raise IndexError(f"Frame index {idx} out of range.")
+            self._seek(idx)
+            success, img = self.cap.read()
+            if not success:
+                raise ValueError(f"Cannot read frame {idx}.")
+            self.next_idx += 1
+            usec = int(self.index.usecs[idx])
+            pos_usec = int(self.cap.get(cv.CAP_PROP_POS_MSEC) * 1000)
+            if pos_usec != usec:
+                lg.warning(f"Frame {idx} read at {pos_usec} μsec, expected {usec}")
+            decoded[idx] = Frame(
+                frame=img, usec=usec, idx=idx, source=self.index.fingerprint
+            )
+        return [decoded[idx] for idx in indices]
+
+    def get_frames_at(self, usecs: Iterable[int]) -> list[Frame]:
+        """Get the frames nearest to the given timestamps, in order."""
+        return self.get_frames(self.index.frame_at_usec(usec) for usec in usecs)
+
+    def get_frame_at(self, usec: int) -> Frame:
+        """Get the frame nearest to the timestamp."""
+        return self.get_frames_at([usec])[0]
+
+    def close(self) -> None:
+        """Close the video."""
+        self.cap.release()
+
+    def __enter__(self) -> Self:
+        """Enter the context."""
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        """Exit the context."""
+        self.close()
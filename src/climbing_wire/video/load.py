@@ -5,49 +5,96 @@ https://stackoverflow.com/questions/33311153/python-extracting-and-saving-video-
 
 from itertools import pairwise
 from pathlib import Path
-from typing import Generator
+from queue import Empty, Full, Queue
+from threading import Event, Thread
+from typing import Generator, Literal
 
 import cv2 as cv
 from loguru import logger as lg
 import numpy as np
 
+from climbing_wire.utils.data import file_fingerprint
 from climbing_wire.video.frame import Frame
+from climbing_wire.video.transform import FrameTransform
 
 
 def pairwise_video_frames(
     in_vid_path: Path,
     msec_interval: int = 0,
+    transform: FrameTransform | None = None,
 ) -> Generator[tuple[np.ndarray, np.ndarray], None, None]:
     """Pairwise frames from video.
 
     Args:
         in_vid_path: Input video file.
         msec_interval: Interval between frames in milliseconds.
+        transform: Optional transform applied to each frame after decoding.
     """
-    yield from pairwise(iterate_video_frames(in_vid_path, msec_interval))
+    frames = iterate_video_frames(in_vid_path, msec_interval, transform=transform)
+    yield from pairwise(frames)
 
 
 def first_video_frame(
     in_vid_path: Path,
+    transform: FrameTransform | None = None,
 ) -> np.ndarray:
     """First frame from video.
 
     Args:
         in_vid_path: Input video file.
+        transform: Optional transform applied to the frame after decoding.
     """
-    return next(iterate_video_frames(in_vid_path))[0]
+    return next(iterate_video_frames(in_vid_path, transform=transform))[0]
+
+
+def video_frame_source(
+    in_vid_path: Path,
+    transform: FrameTransform | None = None,
+) -> str:
+    """Identify the frames of a video, as extracted with a transform.
+
+    Used as the source of the Frame objects, so that frames from different
+    videos, or transformed differently, are never mistaken for each other.
+    """
+    source = file_fingerprint(in_vid_path)
+    if transform is not None and not transform.is_identity:
+        source = f"{source}_{transform}"
+    return source
+
+
+def video_frame_at_msec(msec: float, fps: float) -> int:
+    """Index of the frame shown at a timestamp, as picked when seeking.
+
+    Uses the same arithmetic as the FFmpeg backend, so that the ties at half
+    a frame, and the float rounding around them, are broken the same way.
+    """
+    return int(msec / 1000 * fps + 0.5)
 
 
 def iterate_video_frames(
     in_vid_path: Path,
     msec_interval: int = 0,
     # keep_every_nth_frame: int = 1,
+    skip_mode: Literal["auto", "grab", "seek"] = "auto",
+    max_grab_frames: int = 30,
+    transform: FrameTransform | None = None,
 ) -> Generator[np.ndarray, None, None]:
     """Extract frames from video, yield them one at a time.
 
+    With an msec_interval, the frames in between can be skipped in two ways:
+    "seek" sets the position of the capture before each read, which on
+    compressed video means seeking to the previous keyframe and decoding from
+    there, "grab" grabs the frames in between without decoding them.
+    With the FFmpeg backend both yield the same frames, see video_frame_at_msec.
+
     Args:
         in_vid_path: Input video file.
         msec_interval: Interval between frames in milliseconds.
+        skip_mode: How to skip frames, "grab", "seek", or "auto" to grab
+            when at most max_grab_frames are skipped each time, else seek.
+        max_grab_frames: Maximum number of frames skipped by grabbing
+            in "auto" mode.
+        transform: Optional transform applied to each frame after decoding.
     """
     # start capturing the feed
     cap = cv.VideoCapture(str(in_vid_path))
@@ -62,20 +109,45 @@ def iterate_video_frames(
         tot_frame_count = cap.get(cv.CAP_PROP_FRAME_COUNT)
         # lg.info(f"Total number of frames: {tot_frame_count}")
 
+        # pick how to skip frames
+        if skip_mode == "auto":
+            frames_per_interval = msec_interval * fps * 0.001
+            skip_mode = "grab" if frames_per_interval <= max_grab_frames else "seek"
+        # without a valid frame rate we cannot know which frames to grab
+        if fps <= 0:
+            skip_mode = "seek"
+
         # start loading the video
         count = 0
+        # index of the next frame that grab would return
+        next_frame_idx = 0
         success = True
         while success:
             # skip some frames
-            if msec_interval > 0:
+            if msec_interval > 0 and skip_mode == "seek":
                 cap.set(cv.CAP_PROP_POS_MSEC, (count * msec_interval))
                 pos_msec = cap.get(cv.CAP_PROP_POS_MSEC)
                 # lg.debug(f"Video position after set: {pos_msec} msec")
+            elif msec_interval > 0:
+                target_idx = video_frame_at_msec(count * msec_interval, fps)
+                # an interval shorter than a frame shows the same frame again
+                if target_idx < next_frame_idx:
+                    yield frame.copy()
+                    count = count + 1
+                    continue
+                while success and next_frame_idx < target_idx:
+                    success = cap.grab()
+                    next_frame_idx += 1
+                if not success:
+                    break
 
             # extract the frame
             success, frame = cap.read()
+            next_frame_idx += 1
             if not success:
                 break
+            if transform is not None:
+                frame = transform(frame)
 
             pos_msec = cap.get(cv.CAP_PROP_POS_MSEC)
             # lg.debug(f"Video position: {pos_msec} msec")
@@ -88,11 +160,6 @@ def iterate_video_frames(
             #         # lg.debug(f"Skipping frame")
             #         continue
 
-            # # or if we have a keep-every-nth-frame, skip frames
-            # if count % keep_every_nth_frame == 0:
-            #     lg.debug(f"Yielding frame {count}")
-            #     yield frame, pos_usec
-
             # lg.debug(f"Yielding frame {count}")
             yield frame
             count = count + 1
@@ -106,12 +173,14 @@ def iterate_video_frames(
 def iterate_video_frames_with_timestamp(
     in_vid_path: Path,
     keep_every_nth_frame: int = 1,
+    transform: FrameTransform | None = None,
 ) -> Generator[tuple[np.ndarray, int], None, None]:
     """Extract frames from video, yield them with a μsec timestamp.
 
     Args:
         in_vid_path: Input video file.
         keep_every_nth_frame: Keep every nth frame.
+        transform: Optional transform applied to each frame after decoding.
 
     Yields:
         # Frame and timestamp in μsec.
@@ -131,17 +200,23 @@ def iterate_video_frames_with_timestamp(
         count = 0
         success = True
         while success:
-            # extract the frame
-            success, frame = cap.read()
+            # grab the frame, decode it only if we keep it
+            success = cap.grab()
             if not success:
                 break
 
-            # get the timestamp
-            pos_msec = cap.get(cv.CAP_PROP_POS_MSEC)
-            pos_usec = int(pos_msec * 1000)
-
             # skip frames
             if count % keep_every_nth_frame == 0:
+                success, frame = cap.retrieve()
+                if not success:
+                    break
+                if transform is not None:
+                    frame = transform(frame)
+
+                # get the timestamp
+                pos_msec = cap.get(cv.CAP_PROP_POS_MSEC)
+                pos_usec = int(pos_msec * 1000)
+
                 # lg.debug(f"Yielding frame {count}")
                 yield frame, pos_usec
 
@@ -153,12 +228,184 @@ def iterate_video_frames_with_timestamp(
         cap.release()
 
 
+def _decode_video_frames(
+    in_vid_path: Path,
+    keep_every_nth_frame: int,
+    transform: FrameTransform | None,
+    reuse_buffers: bool,
+    frame_queue: Queue,
+    free_buffers: Queue | None,
+    stop: Event,
+) -> None:
+    """Decode the frames of a video in a queue, on a background thread.
+
+    The queue receives (frame, usec) pairs, then None at the end of the video,
+    or the exception raised while decoding.
+    The skipped frames are grabbed but not decoded.
+    If free_buffers is given, the frames are decoded in the buffers taken from
+    it, once the first frame has set their shape.
+    With a transform, the frames are decoded in a single buffer if
+    reuse_buffers is set, and the transformed frames are put in the queue.
+    """
+
+    def put(item: object) -> bool:
+        """Put an item in the queue, unless the reader stopped."""
+        while not stop.is_set():
+            try:
+                frame_queue.put(item, timeout=0.1)
+                return True
+            except Full:
+                continue
+        return False
+
+    cap = cv.VideoCapture(str(in_vid_path))
+    try:
+        count = 0
+        decode_buf = None
+        while not stop.is_set():
+            # skip frames without decoding them
+            if not cap.grab():
+                break
+            if count % keep_every_nth_frame != 0:
+                count = count + 1
+                continue
+
+            # get a buffer to decode in, if we are reusing them
+            buf = decode_buf
+            if free_buffers is not None and count > 0:
+                buf = free_buffers.get()
+                if buf is None:
+                    break
+
+            # decode the frame
+            success, frame = cap.retrieve(buf)
+            if not success:
+                break
+            if transform is not None:
+                out = transform(frame)
+                # reuse the decoded frame only if the output is a new array
+                if reuse_buffers and not np.shares_memory(out, frame):
+                    decode_buf = frame
+                frame = out
+
+            # get the timestamp
+            pos_msec = cap.get(cv.CAP_PROP_POS_MSEC)
+            pos_usec = int(pos_msec * 1000)
+
+            if not put((frame, pos_usec)):
+                break
+            count = count + 1
+
+        put(None)
+    except Exception as exc:
+        put(exc)
+    finally:
+        cap.release()
+
+
+def prefetch_video_frames_with_timestamp(
+    in_vid_path: Path,
+    keep_every_nth_frame: int = 1,
+    queue_size: int = 8,
+    reuse_buffers: bool = False,
+    transform: FrameTransform | None = None,
+) -> Generator[tuple[np.ndarray, int], None, None]:
+    """Decode frames from video on a background thread, yield them with a timestamp.
+
+    Same as iterate_video_frames_with_timestamp, but the frames are decoded
+    ahead of the consumer, in a bounded queue.
+
+    Args:
+        in_vid_path: Input video file.
+        keep_every_nth_frame: Keep every nth frame.
+        queue_size: Maximum number of decoded frames waiting to be yielded.
+        reuse_buffers: Decode the frames in a fixed pool of preallocated
+            buffers instead of allocating a new array for each frame.
+            Each frame is then only valid until the next one is requested:
+            copy it to keep it.
+            With a transform, only the decoded frame is reused, and the
+            yielded frames are new arrays.
+        transform: Optional transform applied to each frame after decoding,
+            on the background thread.
+
+    Yields:
+        Frame and timestamp in μsec.
+    """
+    if transform is not None and transform.is_identity:
+        # the identity returns the decoded frame itself
+        transform = None
+    frame_queue: Queue = Queue(queue_size)
+    free_buffers: Queue | None = None
+    if reuse_buffers and transform is None:
+        # enough buffers for the queue, the decoder and the consumer
+        free_buffers = Queue()
+    stop = Event()
+    decoder = Thread(
+        target=_decode_video_frames,
+        args=(
+            in_vid_path,
+            keep_every_nth_frame,
+            transform,
+            reuse_buffers,
+            frame_queue,
+            free_buffers,
+            stop,
+        ),
+        daemon=True,
+    )
+    decoder.start()
+
+    try:
+        prev_frame = None
+        while True:
+            item = frame_queue.get()
+            if item is None:
+                break
+            if isinstance(item, Exception):
+                raise item
+            frame, pos_usec = item
+
+            # give the buffers back to the decoder
+            if free_buffers is not None:
+                if prev_frame is None:
+                    for _ in range(queue_size + 1):
+                        free_buffers.put(np.empty_like(frame))
+                else:
+                    free_buffers.put(prev_frame)
+                prev_frame = frame
+
+            yield frame, pos_usec
+
+    finally:
+        # stop the decoder, also if the consumer stopped early
+        stop.set()
+        if free_buffers is not None:
+            free_buffers.put(None)
+        while decoder.is_alive():
+            try:
+                frame_queue.get(timeout=0.1)
+            except Empty:
+                pass
+        decoder.join()
+
+
 def list_video_frames_with_timestamp(
     in_vid_path: Path,
     keep_every_nth_frame: int = 1,
     max_frame_count: int = 0,
+    prefetch: bool = False,
+    transform: FrameTransform | None = None,
 ) -> list[Frame]:
-    """Extract frames from video, return them as a list."""
+    """Extract frames from video, return them as a list.
+
+    Args:
+        in_vid_path: Input video file.
+        keep_every_nth_frame: Keep every nth frame.
+        max_frame_count: Maximum number of frames to load, 0 for all.
+        prefetch: Decode the frames on a background thread.
+        transform: Optional transform applied to each frame after decoding,
+            e.g. to keep smaller or grayscale frames in the list.
+    """
     frames: list[Frame] = []
 
     # we need the fps for this, so we might need to open the cap here?
@@ -168,12 +415,20 @@ def list_video_frames_with_timestamp(
     #     f" will load {fps * keep_every_nth_frame * max_num_frames} milliseconds"
     # )
 
+    iterate_frames = (
+        prefetch_video_frames_with_timestamp
+        if prefetch
+        else iterate_video_frames_with_timestamp
+    )
+
+    source = video_frame_source(in_vid_path, transform)
     frame_num = 0
-    for frame, usec in iterate_video_frames_with_timestamp(
+    for frame, usec in iterate_frames(
         in_vid_path,
         keep_every_nth_frame=keep_every_nth_frame,
+        transform=transform,
     ):
-        f = Frame(frame=frame, usec=usec, idx=frame_num)
+        f = Frame(frame=frame, usec=usec, idx=frame_num, source=source)
         frames.append(f)
 
         frame_num += 1
@@ -0,0 +1,66 @@
+"""Share frames with worker processes through shared memory.
+
+The frames are copied once in a shared memory block,
+the workers attach to it with a small picklable spec.
+"""
+
+from multiprocessing import shared_memory
+from typing import Any, Sequence
+
+import numpy as np
+
+from climbing_wire.video.frame import Frame
+
+FrameLike = Frame | np.ndarray
+
+
+def share_frames(
+    frames: Sequence[FrameLike],
+) -> tuple[shared_memory.SharedMemory, dict[str, Any]]:
+    """Copy the frames in a new shared memory block.
+
+    All the frames must have the same shape and dtype.
+
+    Returns:
+        The shared memory block, and a small picklable spec to attach to it.
+    """
+    imgs = [f.frame if isinstance(f, Frame) else f for f in frames]
+    if len({(img.shape, img.dtype) for img in imgs}) > 1:
+        raise ValueError("All the frames must have the same shape and dtype.")
+    shape = (len(imgs), *imgs[0].shape) if imgs else (0,)
+    dtype = imgs[0].dtype if imgs else np.dtype(np.uint8)
+    nbytes = max(int(np.prod(shape)) * dtype.itemsize, 1)
+    shm = shared_memory.SharedMemory(create=True, size=nbytes)
+    stack = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    for i, img in enumerate(imgs):
+        stack[i] = img
+    is_frame = len(frames) > 0 and isinstance(frames[0], Frame)
+    spec = {
+        "name": shm.name,
+        "shape": shape,
+        "dtype": dtype.str,
+        "usec": [f.usec for f in frames] if is_frame else None,
+        "idx": [f.idx for f in frames] if is_frame else None,
+        "source": [f.source for f in frames] if is_frame else None,
+    }
+    return shm, spec
+
+
+def attach_frames(
+    spec: dict[str, Any],
+) -> tuple[shared_memory.SharedMemory, list[FrameLike]]:
+    """Attach to frames shared with share_frames.
+
+    The frames are views on the shared memory block, that must be kept open.
+    """
+    shm = shared_memory.SharedMemory(name=spec["name"])
+    stack = np.ndarray(spec["shape"], dtype=np.dtype(spec["dtype"]), buffer=shm.buf)
+    if spec["usec"] is None:
+        return shm, list(stack)
+    frames: list[FrameLike] = [
+        Frame(frame=img, usec=usec, idx=idx, source=source)
+        for img, usec, idx, source in zip(
+            stack, spec["usec"], spec["idx"], spec["source"]
+        )
+    ]
+    return shm, frames
@@ -0,0 +1,76 @@
+"""Transform a frame right after it is decoded.
+
+Crop, resize and convert the colour of the frames once, so that the full
+resolution BGR frames are not held and copied downstream.
+"""
+
+from dataclasses import dataclass
+from typing import Literal
+
+import cv2 as cv
+import numpy as np
+
+COLOR_MODES = Literal["bgr", "rgb", "gray"]
+
+# conversion from the BGR frames of OpenCV to each colour mode
+COLOR_CONVERSIONS = {
+    "rgb": cv.COLOR_BGR2RGB,
+    "gray": cv.COLOR_BGR2GRAY,
+}
+
+
+@dataclass(frozen=True)
+class FrameTransform:
+    """Crop, resize and convert the colour of a frame, in this order.
+
+    Attributes:
+        roi: The crop rectangle as (x, y, width, height), None to keep the
+            whole frame.
+        scale: Resize the frame by this factor.
+        size: Resize the frame to this (width, height), overrides scale.
+        color: The colour mode of the output frame, "bgr", "rgb" or "gray".
+    """
+
+    roi: tuple[int, int, int, int] | None = None
+    scale: float = 1.0
+    size: tuple[int, int] | None = None
+    color: COLOR_MODES = "bgr"
+
+    @property
+    def is_identity(self) -> bool:
+        """Whether the transform leaves the frame unchanged."""
+        return (
+            self.roi is None
+            and self.scale == 1.0
+            and self.size is None
+            and self.color == "bgr"
+        )
+
+    def __call__(self, frame: np.ndarray) -> np.ndarray:
+        """Transform a BGR frame.
+
+        The output never shares memory with the input, unless the transform
+        is the identity, so the decoded frame can be released or reused.
+        """
+        if self.is_identity:
+            return frame
+
+        if self.roi is not None:
+            x, y, w, h = self.roi
+            frame = frame[y : y + h, x : x + w]
+
+        if self.size is not None:
+            frame = cv.resize(frame, self.size, interpolation=cv.INTER_AREA)
+        elif self.scale != 1.0:
+            interpolation = cv.INTER_AREA if self.scale < 1 else cv.INTER_LINEAR
+            frame = cv.resize(
+                frame, None, fx=self.scale, fy=self.scale, interpolation=interpolation
+            )
+
+        if self.color in COLOR_CONVERSIONS:
+            frame = cv.cvtColor(frame, COLOR_CONVERSIONS[self.color])
+        elif self.size is None and self.scale == 1.0:
+            # only cropped, copy it out of the decoded frame
+            frame = frame.copy()
+
+        return frame
@@ -0,0 +1,60 @@
+"""Shared fixtures for the tests."""
+
+from pathlib import Path
+from typing import Callable
+
+import cv2 as cv
+import numpy as np
+import pytest
+
+
+def _textured_image(seed: int = 0, shape: tuple[int, int] = (240, 320)) -> np.ndarray:
+    """A BGR image with random blocks, rich in features."""
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 256, (shape[0] // 8, shape[1] // 8, 3), dtype=np.uint8)
+    return np.repeat(np.repeat(small, 8, axis=0), 8, axis=1)
+
+
+@pytest.fixture
+def textured_image() -> Callable[..., np.ndarray]:
+    """Build textured BGR images, from a seed and a shape."""
+    return _textured_image
+
+
+def _frame_id(img: np.ndarray) -> int:
+    """Read the index written in a frame by make_video."""
+    bits = img[img.shape[0] // 2, 4::8, 0] > 128
+    return int(sum(1 << b for b, bit in enumerate(bits) if bit))
+
+
+@pytest.fixture
+def frame_id() -> Callable[[np.ndarray], int]:
+    """Read the index written in a frame by make_video."""
+    return _frame_id
+
+
+@pytest.fixture
+def make_video(tmp_path: Path) -> Callable[..., Path]:
+    """Write a video whose frames show their index, in binary blocks."""
+
+    def make(
+        name: str = "video.avi",
+        fps: float = 30,
+        count: int = 120,
+        fourcc: str = "MJPG",
+    ) -> Path:
+        path = tmp_path / name
+        bits = 12
+        writer = cv.VideoWriter(
+            str(path), cv.VideoWriter_fourcc(*fourcc), fps, (8 * bits, 48)
+        )
+        for i in range(count):
+            img = np.zeros((48, 8 * bits, 3), np.uint8)
+            for b in range(bits):
+                if i >> b & 1:
+                    img[:, b * 8 : (b + 1) * 8] = 255
+            writer.write(img)
+        writer.release()
+        return path
+
+    return make
@@ -0,0 +1,40 @@
+"""Tests for the on-disk landmark cache."""
+
+import inspect
+
+import pytest
+
+from climbing_wire.landmark.cache import POSE_IMG_DEFAULTS, LandmarkCache
+from climbing_wire.landmark.compute import PoseImg
+
+
+def test_defaults_match_pose_img() -> None:
+    """Every PoseImg argument that changes the inference is in the key."""
+    params = inspect.signature(PoseImg).parameters
+    defaults = {
+        name: param.default
+        for name, param in params.items()
+        if name != "visibility_threshold"
+    }
+    assert POSE_IMG_DEFAULTS == defaults
+
+
+@pytest.mark.parametrize(
+    "pose_img_kwargs",
+    [
+        {"roi_tracking": True},
+        {"roi_padding": 0.5},
+        {"roi_motion_gain": 1.0},
+        {"roi_min_size": 64},
+        {"roi_reset_shift": 0.2},
+        {"max_inference_size": 256},
+    ],
+)
+def test_record_path_depends_on_options(make_video, tmp_path, pose_img_kwargs) -> None:
+    """The options that change the landmarks change the cache key."""
+    path = make_video(count=5)
+    cache = LandmarkCache(tmp_path / "cache")
+    default_path = cache.record_path(path, {})
+    assert cache.record_path(path, pose_img_kwargs) != default_path
+    # the visibility threshold is applied when replaying
+    assert cache.record_path(path, {"visibility_threshold": 0.9}) == default_path
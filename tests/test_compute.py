@@ -0,0 +1,53 @@
+"""Tests for the MediaPipe Pose wrapper."""
+
+from pathlib import Path
+
+import cv2 as cv
+import numpy as np
+import pytest
+
+from climbing_wire.landmark.compute import PoseImg
+
+SAMPLE_FOL = Path(__file__).parents[1] / "data" / "sample_square"
+
+
+@pytest.fixture
+def pose_img():
+    """A PoseImg in video mode, with ROI tracking."""
+    with PoseImg(roi_tracking=True, roi_reset_shift=0.1) as pose_img:
+        yield pose_img
+
+
+def test_roi_reset_only_on_jumps(pose_img: PoseImg) -> None:
+    """Small moves of the crop keep the MediaPipe tracking state."""
+    pose_img._input_roi = (100, 100, 300, 500)
+    assert not pose_img._roi_jumped((100, 100, 300, 500))
+    # edges moved by at most 10% of the crop size
+    assert not pose_img._roi_jumped((110, 130, 315, 520))
+    # the crop moved by more than 10% of its width
+    assert pose_img._roi_jumped((125, 100, 325, 500))
+    # the crop grew by more than 10% of its height
+    assert pose_img._roi_jumped((100, 100, 300, 550))
+    # switching to the full image, or back, is always a jump
+    assert pose_img._roi_jumped(None)
+    pose_img._input_roi = None
+    assert pose_img._roi_jumped((100, 100, 300, 500))
+    assert not pose_img._roi_jumped(None)
+
+
+def test_roi_tracking_on_moving_person() -> None:
+    """The pose is tracked in the crop, without resetting on every frame."""
+    img = cv.imread(str(SAMPLE_FOL / "photo_1_s.jpg"))
+    h, w = img.shape[:2]
+    frames = []
+    for k in range(10):
+        frame = np.full((h * 2, w * 2, 3), 120, np.uint8)
+        y, x = h // 2 + 5 * k, w // 2 + 8 * k
+        frame[y : y + h, x : x + w] = img
+        frames.append(frame)
+
+    with PoseImg(roi_tracking=True) as pose_img:
+        landlists = [pose_img(frame) for frame in frames]
+        assert all(lli is not None for lli in landlists)
+        assert pose_img.roi is not None
+        assert pose_img.roi_reset_count <= 2
@@ -0,0 +1,39 @@
+"""Tests for the landmark drawing utilities."""
+
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+from climbing_wire.landmark.drawing import draw_landmarks
+from climbing_wire.landmark.landmark_list import LandmarkListImg
+from climbing_wire.utils.mediapipe import NUM_POSE_LANDMARKS
+
+
+def test_import_does_not_load_mediapipe() -> None:
+    """Importing the drawing utilities leaves MediaPipe unloaded."""
+    code = (
+        "import sys\n"
+        "import climbing_wire.landmark.drawing\n"
+        "assert 'mediapipe' not in sys.modules, 'mediapipe was imported'\n"
+    )
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)}
+    subprocess.run([sys.executable, "-c", code], env=env, check=True)
+
+
+def test_draw_with_default_specs() -> None:
+    """The default specs draw the landmarks and the connections."""
+    rng = np.random.default_rng(0)
+    landmarks = np.zeros((NUM_POSE_LANDMARKS, 4))
+    landmarks[:, :2] = rng.uniform(0.2, 0.8, (NUM_POSE_LANDMARKS, 2))
+    landmarks[:, 3] = 1
+    landlist = LandmarkListImg.from_array(landmarks, (240, 320))
+    image = np.zeros((240, 320, 3), np.uint8)
+    draw_landmarks(image, landlist)
+    assert image.any()
+
+    # without specs nothing is drawn
+    blank = np.zeros_like(image)
+    draw_landmarks(blank, landlist, None, None, None)
+    assert not blank.any()
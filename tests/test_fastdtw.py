@@ -0,0 +1,165 @@
+"""Tests for fastdtw, against the original dict-based implementation."""
+
+from collections import defaultdict
+
+import numpy as np
+import pytest
+
+from climbing_wire.fastdtw import fastdtw as fastdtw_module
+from climbing_wire.fastdtw.fastdtw import dtw, fastdtw
+
+
+def _reference_dtw(x, y, window, dist):
+    """The original __dtw, on a list of cells."""
+    len_x, len_y = len(x), len(y)
+    if window is None:
+        window = [(i, j) for i in range(len_x) for j in range(len_y)]
+    window = ((i + 1, j + 1) for i, j in window)
+    D = defaultdict(lambda: (float("inf"), 0, 0))
+    D[0, 0] = (0, 0, 0)
+    for i, j in window:
+        dt = dist(x[i - 1], y[j - 1])
+        D[i, j] = min(
+            (D[i - 1, j][0] + dt, i - 1, j),
+            (D[i, j - 1][0] + dt, i, j - 1),
+            (D[i - 1, j - 1][0] + dt, i - 1, j - 1),
+            key=lambda a: a[0],
+        )
+    path = []
+    i, j = len_x, len_y
+    while not (i == j == 0):
+        path.append((i - 1, j - 1))
+        i, j = D[i, j][1], D[i, j][2]
+    path.reverse()
+    return (D[len_x, len_y][0], path)
+
+
+def _reference_expand_window(path, len_x, len_y, radius):
+    """The original __expand_window, returning a list of cells."""
+    path_ = set(path)
+    for i, j in path:
+        for a in range(-radius, radius + 1):
+            for b in range(-radius, radius + 1):
+                path_.add((i + a, j + b))
+
+    window_ = set()
+    for i, j in path_:
+        for a, b in (
+            (i * 2, j * 2),
+            (i * 2, j * 2 + 1),
+            (i * 2 + 1, j * 2),
+            (i * 2 + 1, j * 2 + 1),
+        ):
+            window_.add((a, b))
+
+    window = []
+    start_j = 0
+    for i in range(0, len_x):
+        new_start_j = None
+        for j in range(start_j, len_y):
+            if (i, j) in window_:
+                window.append((i, j))
+                if new_start_j is None:
+                    new_start_j = j
+            elif new_start_j is not None:
+                break
+        start_j = new_start_j
+    return window
+
+
+def _reference_fastdtw(x, y, radius, dist):
+    """The original __fastdtw."""
+    if len(x) < radius + 2 or len(y) < radius + 2:
+        return _reference_dtw(x, y, None, dist)
+    x_shrunk = x[: len(x) - len(x) % 2 : 2]
+    y_shrunk = y[: len(y) - len(y) % 2 : 2]
+    _, path = _reference_fastdtw(x_shrunk, y_shrunk, radius, dist)
+    window = _reference_expand_window(path, len(x), len(y), radius)
+    return _reference_dtw(x, y, window, dist)
+
+
+def _window_to_intervals(window, len_x):
+    """Convert a list of cells, contiguous in each row, to (starts, ends)."""
+    starts = np.zeros(len_x, dtype=np.intp)
+    ends = np.zeros(len_x, dtype=np.intp)
+    for i in range(len_x):
+        cols = [j for r, j in window if r == i]
+        assert cols == list(range(cols[0], cols[-1] + 1))
+        starts[i], ends[i] = cols[0], cols[-1] + 1
+    return starts, ends
+
+
+def _random_series(rng, n_max=40):
+    """Random series, with small integer values to have many ties."""
+    len_x, len_y = rng.integers(1, n_max, size=2)
+    x = rng.integers(0, 5, len_x).astype(float)
+    y = rng.integers(0, 5, len_y).astype(float)
+    return x, y
+
+
+def _difference(a, b):
+    return abs(a - b)
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_dtw_matches_reference(seed: int) -> None:
+    """The banded engine gives the same distance and path as the dict one."""
+    rng = np.random.default_rng(seed)
+    x, y = _random_series(rng)
+    assert dtw(x, y) == _reference_dtw(x, y, None, _difference)
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_banded_dtw_matches_reference(seed: int) -> None:
+    """The banded engine gives the same result as the dict one on a window."""
+    rng = np.random.default_rng(seed)
+    x, y = _random_series(rng, n_max=60)
+    # with radius 0 the original expansion can leave rows empty, and fail
+    radius = int(rng.integers(1, 4))
+    x_shrunk, y_shrunk = x[: len(x) - len(x) % 2 : 2], y[: len(y) - len(y) % 2 : 2]
+    if len(x_shrunk) == 0 or len(y_shrunk) == 0:
+        return
+    _, path = _reference_dtw(x_shrunk, y_shrunk, None, _difference)
+    window = _reference_expand_window(path, len(x), len(y), radius)
+
+    banded_dtw = getattr(fastdtw_module, "__dtw")
+
+    def cost(ii: np.ndarray, jj: np.ndarray) -> np.ndarray:
+        return np.abs(x[ii] - y[jj])
+
+    result = banded_dtw(
+        np.arange(len(x)), np.arange(len(y)), _window_to_intervals(window, len(x)), cost
+    )
+    assert result == _reference_dtw(x, y, window, _difference)
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_fastdtw_matches_reference(seed: int) -> None:
+    """The whole fastdtw gives the same distance and path as the original."""
+    rng = np.random.default_rng(seed)
+    x, y = _random_series(rng, n_max=120)
+    # with radius 0 the original expansion can leave rows empty, and fail
+    radius = int(rng.integers(1, 4))
+    expected = _reference_fastdtw(x, y, radius, _difference)
+    assert fastdtw(x, y, radius=radius) == expected
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_expand_window_matches_reference(seed: int) -> None:
+    """The interval expansion covers the same cells as the set expansion."""
+    rng = np.random.default_rng(seed)
+    x, y = _random_series(rng, n_max=60)
+    # with radius 0 the original expansion can leave rows empty, and fail
+    radius = int(rng.integers(1, 4))
+    x_shrunk, y_shrunk = x[: len(x) - len(x) % 2 : 2], y[: len(y) - len(y) % 2 : 2]
+    if len(x_shrunk) == 0 or len(y_shrunk) == 0:
+        return
+    _, path = _reference_dtw(x_shrunk, y_shrunk, None, _difference)
+
+    expand_window = getattr(fastdtw_module, "__expand_window")
+    starts, ends = expand_window(path, len(x), len(y), radius)
+
+    expected = _reference_expand_window(path, len(x), len(y), radius)
+    expected_starts, expected_ends = _window_to_intervals(expected, len(x))
+    assert np.array_equal(starts, expected_starts)
+    assert np.array_equal(ends, expected_ends)
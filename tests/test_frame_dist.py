@@ -0,0 +1,40 @@
+"""Tests for the cheap distances between frames."""
+
+import cv2 as cv
+import numpy as np
+import pytest
+
+from climbing_wire.video.frame import Frame
+from climbing_wire.video.frame_dist import (
+    correlation_distance,
+    histogram_distance,
+    thumbnail_distance,
+)
+
+
+def test_distances_are_cached_per_frame(textured_image) -> None:
+    """The distances match the direct computation, and reuse the variants."""
+    img1 = textured_image(0)
+    img2 = textured_image(1)
+    f1 = Frame(frame=img1, usec=0, idx=0)
+    f2 = Frame(frame=img2, usec=1000, idx=1)
+
+    g1 = cv.cvtColor(img1, cv.COLOR_BGR2GRAY)
+    g2 = cv.cvtColor(img2, cv.COLOR_BGR2GRAY)
+    t1 = cv.resize(g1, (32, 32), interpolation=cv.INTER_AREA).astype(np.float32)
+    t2 = cv.resize(g2, (32, 32), interpolation=cv.INTER_AREA).astype(np.float32)
+    assert thumbnail_distance(f1, f2) == pytest.approx(((t1 - t2) ** 2).mean())
+
+    correlation_distance(f1, f2)
+    histogram_distance(f1, f2)
+    variants = dict(f1._variants)
+    assert ("thumbnail", 32) in variants
+    assert ("thumbnail", 64) in variants
+    assert ("hs_histogram", 32) in variants
+
+    # the cached variants are returned, not rebuilt
+    thumbnail_distance(f1, f2)
+    histogram_distance(f1, f2)
+    for key, value in variants.items():
+        assert f1._variants[key] is value
+    assert histogram_distance(f1, f1) == pytest.approx(0, abs=1e-6)
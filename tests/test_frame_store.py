@@ -0,0 +1,82 @@
+"""Tests for the memory-mapped frame store."""
+
+import pickle
+
+import numpy as np
+import pytest
+
+from climbing_wire.video.frame_store import FRAMES_FILE, META_FILE, FrameStore
+from climbing_wire.video.load import iterate_video_frames_with_timestamp
+from climbing_wire.video.transform import FrameTransform
+
+
+def test_build_stores_the_frames(make_video, tmp_path) -> None:
+    """The stored frames and timestamps match the decoded ones."""
+    path = make_video(count=20)
+    store = FrameStore.build(path, tmp_path / "store")
+
+    decoded = list(iterate_video_frames_with_timestamp(path))
+    assert len(store) == len(decoded) == 20
+    for frame, (img, usec) in zip(store, decoded):
+        assert np.array_equal(frame.frame, img)
+        assert frame.usec == usec
+        assert frame.source is not None
+    assert [f.idx for f in store[-3:]] == [17, 18, 19]
+    assert not store[0].frame.flags.writeable
+    with pytest.raises(IndexError):
+        store[20]
+
+
+def test_build_reuses_or_rebuilds(make_video, frame_id, tmp_path) -> None:
+    """The store is reused only for the same video and arguments."""
+    path = make_video(count=20)
+    store_fol = tmp_path / "store"
+    store = FrameStore.build(path, store_fol, keep_every_nth_frame=2)
+    mtime = (store_fol / FRAMES_FILE).stat().st_mtime_ns
+
+    reused = FrameStore.build(path, store_fol, keep_every_nth_frame=2)
+    assert (store_fol / FRAMES_FILE).stat().st_mtime_ns == mtime
+    assert reused.meta == store.meta
+
+    # a different config rebuilds the store
+    rebuilt = FrameStore.build(path, store_fol, keep_every_nth_frame=1)
+    assert len(rebuilt) == 20
+    assert [frame_id(f.frame) for f in rebuilt[:3]] == [0, 1, 2]
+
+    # so does a different transform, which also changes the frame source
+    transform = FrameTransform(color="rgb")
+    rgb = FrameStore.build(path, store_fol, transform=transform)
+    assert rgb.meta["config"] != rebuilt.meta["config"]
+    assert rgb[0].source != rebuilt[0].source
+    assert FrameStore.build(path, store_fol, transform=transform).meta == rgb.meta
+
+    # an incomplete store is not opened
+    (store_fol / META_FILE).unlink()
+    with pytest.raises(FileNotFoundError):
+        FrameStore(store_fol)
+
+
+def test_empty_store(make_video, tmp_path) -> None:
+    """A video without frames gives an empty store."""
+    path = make_video(count=0)
+    store = FrameStore.build(path, tmp_path / "store")
+    assert len(store) == 0
+    assert len(store.frames) == 0
+    assert store[:] == []
+    assert len(FrameStore(tmp_path / "store")) == 0
+
+
+def test_pickle_without_memmap(make_video, tmp_path) -> None:
+    """Pickling drops the memory map, which is opened again on first use."""
+    path = make_video(count=20)
+    store = FrameStore.build(path, tmp_path / "store")
+    # map the file before pickling
+    assert isinstance(store.frames, np.memmap)
+
+    data = pickle.dumps(store)
+    assert len(data) < store.frames.nbytes
+    loaded = pickle.loads(data)
+    assert loaded._frames is None
+    assert store._frames is not None
+    assert np.array_equal(loaded[5].frame, store[5].frame)
+    assert isinstance(loaded.frames, np.memmap)
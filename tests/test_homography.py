@@ -0,0 +1,92 @@
+"""Tests for the homography estimation."""
+
+import numpy as np
+import pytest
+
+from climbing_wire.homography.distance import HomographyDistance, PairDistanceCache
+from climbing_wire.homography.homography import HomographyEstimator, HomographyResult
+from climbing_wire.video.frame import Frame
+
+
+def test_frame_key_separates_videos(textured_image) -> None:
+    """Frames with the same index and timestamp from two videos do not collide."""
+    img = textured_image(0)
+    shifted = np.roll(img, 16, axis=1)
+    ref = Frame(frame=img, usec=0, idx=0, source="ref")
+    video_a = Frame(frame=img, usec=1000, idx=1, source="a")
+    video_b = Frame(frame=shifted, usec=1000, idx=1, source="b")
+
+    estimator = HomographyEstimator()
+    M_a = estimator.compute_frames(ref, video_a)
+    M_b = estimator.compute_frames(ref, video_b)
+
+    assert len(estimator.cache) == 3
+    assert np.allclose(M_a, np.eye(3), atol=1e-2)
+    assert M_b[0, 2] == pytest.approx(16, abs=0.5)
+
+
+def test_frame_key_requires_source(textured_image) -> None:
+    """The default key refuses frames that cannot be told apart."""
+    img = textured_image(0)
+    f1 = Frame(frame=img, usec=0, idx=0)
+    f2 = Frame(frame=img, usec=1000, idx=1)
+    estimator = HomographyEstimator()
+    with pytest.raises(ValueError):
+        estimator.compute_frames(f1, f2)
+    # explicit keys are still accepted
+    M = estimator.compute_frames(f1, f2, key1="f1", key2="f2")
+    assert np.allclose(M, np.eye(3), atol=1e-2)
+
+
+def test_pair_distance_cache_round_trip(tmp_path) -> None:
+    """The distances and homographies are read back, also for failed pairs."""
+    M = np.array([[1.0, 0.1, 16.0], [0.0, 1.0, -2.5], [1e-4, 0.0, 1.0]])
+    key_ok = ("a", 0, "b", 1000, "cfg")
+    key_fail = ("a", 0, "b", 2000, "cfg")
+    with PairDistanceCache(tmp_path / "pairs.db") as cache:
+        assert cache.get(key_ok) is None
+        cache.put(key_ok, 12.5, HomographyResult(M, 40, 50))
+        cache.put(key_fail, 99.0, None)
+        assert len(cache) == 2
+
+    # a new connection reads what the first one wrote
+    with PairDistanceCache(tmp_path / "pairs.db") as cache:
+        distance, result = cache.get(key_ok)
+        assert distance == 12.5
+        assert np.array_equal(result.M, M)
+        assert (result.inliers, result.matches) == (40, 50)
+        assert cache.get(key_fail) == (99.0, None)
+        assert cache.get(("a", 0, "b", 1000, "other")) is None
+
+
+def test_homography_distance_separates_sources(textured_image, tmp_path) -> None:
+    """Frames with the same timestamp from two videos get their own entries."""
+    img = textured_image(0)
+    shifted = np.roll(img, 16, axis=1)
+    ref = Frame(frame=img, usec=0, idx=0, source="ref")
+    video_a = Frame(frame=img, usec=1000, idx=1, source="a")
+    video_b = Frame(frame=shifted, usec=1000, idx=1, source="b")
+
+    with PairDistanceCache(tmp_path / "pairs.db") as cache:
+        dist = HomographyDistance(cache=cache)
+        d_a, res_a = dist.compute(ref, video_a)
+        d_b, res_b = dist.compute(ref, video_b)
+        assert d_a < 1
+        # each corner moves 16 pixels along x only
+        assert d_b == pytest.approx(16**2 / 2, rel=0.1)
+        assert len(cache) == 2
+
+        # a fresh distance reads both pairs from the cache
+        cached = HomographyDistance(cache=cache)
+        assert cached.compute(ref, video_b)[0] == d_b
+        assert np.allclose(cached.compute(ref, video_a)[1].M, res_a.M)
+        assert len(cached.estimator.cache) == 0
+
+
+def test_homography_distance_requires_source(textured_image) -> None:
+    """Frames without a source cannot be used as keys."""
+    img = textured_image(0)
+    f1 = Frame(frame=img, usec=0, idx=0)
+    f2 = Frame(frame=img, usec=0, idx=0, source="b")
+    with pytest.raises(ValueError):
+        HomographyDistance()(f1, f2)
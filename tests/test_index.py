@@ -0,0 +1,44 @@
+"""Tests for the video index and the seeking frame reader."""
+
+import numpy as np
+import pytest
+
+from climbing_wire.video.index import VideoFrameReader, VideoIndex, presentation_order
+
+
+def test_presentation_order_with_b_frames() -> None:
+    """Packets in decode order are sorted, keeping their keyframe flags."""
+    # I0 P3 B1 B2 P6 B4 B5 I9 B7 B8, timestamps in units of 1000 μsec
+    pts = np.array([0, 3, 1, 2, 6, 4, 5, 9, 7, 8]) * 1000
+    is_key = np.array([1, 0, 0, 0, 0, 0, 0, 1, 0, 0], dtype=bool)
+
+    usecs, key_idxs = presentation_order(pts, is_key)
+
+    assert np.array_equal(usecs, np.arange(10) * 1000)
+    assert np.array_equal(key_idxs, [0, 0, 0, 0, 0, 0, 0, 0, 0, 9])
+    index = VideoIndex(usecs, key_idxs, "fingerprint")
+    assert index.frame_at_usec(4400) == 4
+    assert index.frame_at_usec(8600) == 9
+
+
+def test_index_requires_increasing_timestamps() -> None:
+    """Timestamps in decode order are rejected."""
+    with pytest.raises(ValueError):
+        VideoIndex(np.array([0, 3, 1, 2]), np.zeros(4, dtype=np.int64), "fp")
+
+
+def test_reader_matches_sequential_decode(make_video, frame_id, tmp_path) -> None:
+    """Random access through the index gets the right frames."""
+    path = make_video("video.mp4", count=100, fourcc="mp4v")
+    index = VideoIndex.load_or_build(path, tmp_path / "index.npz")
+    assert len(index) == 100
+    assert np.all(np.diff(index.usecs) > 0)
+    assert len(index.keyframes) > 1
+
+    indices = [57, 3, 99, 3, 40, 41, 0]
+    with VideoFrameReader(path, index) as reader:
+        frames = reader.get_frames(indices)
+        assert [frame_id(f.frame) for f in frames] == indices
+        assert [f.usec for f in frames] == [index.usecs[i] for i in indices]
+        frame = reader.get_frame_at(int(index.usecs[20]) + 100)
+        assert frame_id(frame.frame) == 20
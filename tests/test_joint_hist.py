@@ -0,0 +1,115 @@
+"""Tests for the joint histories reprojected with a cumulative homography."""
+
+import numpy as np
+import pytest
+
+from climbing_wire.joint_tracker.joint_hist import JointHist, advance_anchor
+from climbing_wire.joint_tracker.joint_tracks import JointTracks
+from climbing_wire.landmark.landmark_list import LandmarkListImg
+from climbing_wire.utils.mediapipe import NUM_POSE_LANDMARKS
+
+IMG_SHAPE = (480, 640)
+
+
+def centered_landlist() -> LandmarkListImg:
+    """All the landmarks in the center of the frame, visible."""
+    landmarks = np.zeros((NUM_POSE_LANDMARKS, 4))
+    landmarks[:, :2] = 0.5
+    landmarks[:, 3] = 1
+    return LandmarkListImg.from_array(landmarks, IMG_SHAPE)
+
+
+def translation(tx: float, ty: float = 0) -> np.ndarray:
+    """A homography that translates by (tx, ty)."""
+    return np.array([[1, 0, tx], [0, 1, ty], [0, 0, 1]], dtype=float)
+
+
+def test_pan_does_not_rebase() -> None:
+    """A pan over a few frame widths keeps the anchor, and the track is exact."""
+    jh = JointHist("left_hand")
+    num_frames = 200
+    landlist = centered_landlist()
+    for _ in range(num_frames):
+        jh.add_frame(landlist, translation(-10))
+
+    # the anchor is still the first frame
+    assert jh.C[0, 2] == pytest.approx(-10 * num_frames)
+    expected_x = 320 - 10 * np.arange(num_frames - 1, -1, -1)
+    assert np.allclose(jh.track[:, 0], expected_x)
+    assert np.allclose(jh.track[:, 1], 240)
+
+
+def test_rebase_on_degenerate_homography() -> None:
+    """A strong zoom moves the anchor, and keeps the track."""
+    C = np.eye(3)
+    zoom = np.diag([0.5, 0.5, 1.0])
+    rebased_at = None
+    for k in range(20):
+        C, C_inv, rebase = advance_anchor(C, zoom, IMG_SHAPE, 1e4)
+        assert np.allclose(C @ C_inv, np.eye(3))
+        if rebase:
+            rebased_at = k
+            break
+    # the condition number of the zoom is 2 ** k after k frames
+    assert rebased_at == 13
+
+    jh = JointHist("left_hand", max_anchor_cond=100)
+    landlist = centered_landlist()
+    for _ in range(10):
+        jh.add_frame(landlist, zoom)
+    # rebased at the 7th frame
+    assert jh.C[0, 0] == pytest.approx(0.5**3)
+    # the points of the previous frames shrink towards the origin
+    expected_x = 320 * 0.5 ** np.arange(9, -1, -1)
+    assert np.allclose(jh.track[:, 0], expected_x)
+
+
+def test_stacked_tracks_match_hist() -> None:
+    """The stacked storage rebases like JointHist, and keeps the same tracks."""
+    joint_names = ("left_hand", "right_foot")
+    jts = JointTracks(joint_names, max_anchor_cond=100)
+    jhs = [JointHist(name, max_anchor_cond=100) for name in joint_names]
+    landlist = centered_landlist()
+    rng = np.random.default_rng(0)
+    for _ in range(30):
+        M = translation(*rng.uniform(-20, 20, 2)) @ np.diag([0.8, 0.8, 1.0])
+        jts.add_frame(landlist, M)
+        for jh in jhs:
+            jh.add_frame(landlist, M)
+
+    assert np.allclose(jts.C, jhs[0].C)
+    for name, jh in zip(joint_names, jhs):
+        assert np.allclose(jts[name].track, jh.track)
+
+
+
+@pytest.mark.parametrize("stacked", [False, True], ids=["JointHist", "JointTracks"])
+def test_snapshot_survives_rebase_and_growth(stacked: bool) -> None:
+    """A snapshot keeps its track when the history is rebased and regrown."""
+    if stacked:
+        hist = JointTracks(["left_hand"], capacity=4, max_anchor_cond=100)
+        view = hist["left_hand"]
+    else:
+        hist = view = JointHist("left_hand", capacity=4, max_anchor_cond=100)
+    landlist = centered_landlist()
+    zoom = np.diag([0.5, 0.5, 1.0])
+    for _ in range(3):
+        hist.add_frame(landlist, zoom)
+    snap = view.snapshot()
+    anchor_track = snap.anchor_track.copy()
+    visibility = snap.visibility.copy()
+    track = snap.track.copy()
+
+    # the zoom forces a rebase, and the frames overflow the capacity
+    for _ in range(10):
+        hist.add_frame(landlist, zoom)
+    assert hist.capacity > 4
+    assert not np.allclose(hist.C, np.diag([0.5**13, 0.5**13, 1.0]))
+    assert not np.allclose(view.track[:3], anchor_track)
+
+    assert len(snap) == 3
+    assert np.array_equal(snap.anchor_track, anchor_track)
+    assert np.array_equal(snap.visibility, visibility)
+    assert np.array_equal(snap.track, track)
+    # the positions are still those of the frame of the snapshot
+    assert np.allclose(snap.track[:, 0], [320 * 0.25, 320 * 0.5, 320])
@@ -0,0 +1,50 @@
+"""Tests for the JointTracker."""
+
+import numpy as np
+import pytest
+
+from climbing_wire.homography.stream import iterate_frame_homographies
+from climbing_wire.joint_tracker.joint_tracker import JointTracker
+from climbing_wire.landmark.landmark_list import LandmarkListImg
+from climbing_wire.utils.mediapipe import NUM_POSE_LANDMARKS
+
+
+def centered_landlist(img_shape: tuple[int, int]) -> LandmarkListImg:
+    """All the landmarks in the center of the frame, visible."""
+    landmarks = np.zeros((NUM_POSE_LANDMARKS, 4))
+    landmarks[:, :2] = 0.5
+    landmarks[:, 3] = 1
+    return LandmarkListImg.from_array(landmarks, img_shape)
+
+
+@pytest.mark.parametrize("storage", ["hist", "stacked"])
+def test_failed_homography_restarts_history(textured_image, storage) -> None:
+    """A frame without homography restarts the joint histories."""
+    img = textured_image(0)
+    shifted = np.roll(img, 16, axis=1)
+    blank = np.zeros_like(img)
+    frames = [img, shifted, blank, img, shifted, img]
+    landlist = centered_landlist(img.shape[:2])
+
+    jt = JointTracker(storage=storage)
+    lengths = []
+    for frame, M in iterate_frame_homographies(iter(frames)):
+        jt.update(frame, M, landlist)
+        lengths.append(len(jt.joint_hists["left_hand"]))
+    # restarted on the blank frame, and on the frame after it
+    assert lengths == [1, 1, 1, 2, 3]
+    track = jt.joint_hists["left_hand"].track
+    assert np.allclose(track[:, 0], [160, 144, 160], atol=0.5)
+    assert jt.copy().M is not None
+
+
+def test_replay_restarts_on_failed_frame(textured_image) -> None:
+    """The tracker motion model failing does not raise, and restarts."""
+    img = textured_image(0)
+    frames = [img, np.roll(img, 16, axis=1), np.zeros_like(img), img]
+    landlist = centered_landlist(img.shape[:2])
+    jt = JointTracker()
+    for frame in frames:
+        jt.replay_next_frame(frame, landlist)
+    assert len(jt.joint_hists["left_hand"]) == 1
+    assert jt.M is None
@@ -0,0 +1,67 @@
+"""Tests for the landmarks of a whole video, stored by column."""
+
+import numpy as np
+
+from climbing_wire.landmark.cache import LandmarkRecord
+from climbing_wire.landmark.landmark_list import LandmarkListImg
+from climbing_wire.landmark.landmark_sequence import LandmarkSequence
+from climbing_wire.utils.mediapipe import NUM_POSE_LANDMARKS
+
+IMG_SHAPE = (480, 640)
+
+
+def random_landmarks(num_frames: int, seed: int = 0) -> np.ndarray:
+    """Random (F, 33, 4) landmarks, exactly representable in float32."""
+    rng = np.random.default_rng(seed)
+    landmarks = rng.uniform(-0.1, 1.1, (num_frames, NUM_POSE_LANDMARKS, 4))
+    landmarks[..., 3] = rng.uniform(0, 1, (num_frames, NUM_POSE_LANDMARKS))
+    return landmarks.astype(np.float32).astype(float)
+
+
+def test_frames_are_views() -> None:
+    """The landmarks of a frame are views on the rows of the sequence."""
+    landmarks = random_landmarks(5)
+    found = np.array([True, False, True, True, True])
+    seq = LandmarkSequence(IMG_SHAPE, capacity=8)
+    seq.extend(landmarks, found, np.arange(5) * 1000)
+
+    assert seq[1] is None
+    lli = seq[2]
+    expected = LandmarkListImg.from_array(landmarks[2], IMG_SHAPE)
+    assert np.array_equal(lli.landmarks_img, expected.landmarks_img)
+    assert np.array_equal(lli.drawable, expected.drawable)
+    assert np.array_equal(lli.to_array(), landmarks[2])
+
+    for name in ("landmarks_norm", "landmarks_z", "visibility", "landmarks_img"):
+        assert np.shares_memory(getattr(lli, name), getattr(seq, name))
+    assert np.shares_memory(lli.drawable, seq.drawable)
+    # writing in the sequence shows in the frame
+    seq.landmarks_img[2, 0] = (7, 9)
+    assert tuple(lli.landmarks_img[0]) == (7, 9)
+
+
+def test_extend_save_load_round_trip(tmp_path) -> None:
+    """A sequence stored in a record loads back with the same landmarks."""
+    landmarks = random_landmarks(300)
+    found = np.random.default_rng(1).uniform(size=300) > 0.2
+    usecs = np.arange(300) * 33_333
+    seq = LandmarkSequence(IMG_SHAPE, capacity=4)
+    # extend in batches, growing the buffers
+    for start in range(0, 300, 70):
+        batch = slice(start, start + 70)
+        seq.extend(landmarks[batch], found[batch], usecs[batch])
+    assert len(seq) == 300
+    assert seq.capacity >= 300
+
+    record_path = tmp_path / "record.npz"
+    seq.to_record().save(record_path)
+    loaded = LandmarkSequence.from_record(LandmarkRecord.load(record_path))
+
+    assert loaded.img_shape == seq.img_shape
+    assert np.array_equal(loaded.found, found)
+    assert np.array_equal(loaded.usecs, usecs)
+    for name in ("landmarks_norm", "landmarks_z", "visibility", "landmarks_img"):
+        assert np.array_equal(getattr(loaded, name), getattr(seq, name))
+    assert np.array_equal(loaded.drawable, seq.drawable)
+    for i in np.flatnonzero(found)[:10]:
+        assert np.array_equal(loaded[i].to_array(), landmarks[i])
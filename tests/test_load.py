@@ -0,0 +1,47 @@
+"""Tests for the video loaders."""
+
+import pytest
+
+from climbing_wire.video.load import (
+    iterate_video_frames,
+    iterate_video_frames_with_timestamp,
+    prefetch_video_frames_with_timestamp,
+)
+from climbing_wire.video.transform import FrameTransform
+
+
+@pytest.mark.parametrize("fps", [12.5, 25, 30])
+@pytest.mark.parametrize("msec_interval", [10, 33, 40, 50, 67, 100, 250])
+def test_grab_matches_seek(make_video, frame_id, fps, msec_interval) -> None:
+    """Grabbing the skipped frames yields the same frames as seeking."""
+    path = make_video(fps=fps, count=100)
+    grabbed = iterate_video_frames(path, msec_interval, skip_mode="grab")
+    seeked = iterate_video_frames(path, msec_interval, skip_mode="seek")
+    grab_ids = [frame_id(f) for f in grabbed]
+    seek_ids = [frame_id(f) for f in seeked]
+    assert grab_ids == seek_ids
+    assert len(grab_ids) > 0
+
+
+@pytest.mark.parametrize(
+    "transform",
+    [FrameTransform(), FrameTransform(roi=(0, 0, 64, 48)), FrameTransform(color="rgb")],
+)
+def test_prefetch_reuse_buffers(make_video, frame_id, transform) -> None:
+    """Reusing the buffers never overwrites a frame before it is consumed."""
+    path = make_video(count=200)
+    expected = [frame_id(f) for f, _ in iterate_video_frames_with_timestamp(path)]
+
+    frames = prefetch_video_frames_with_timestamp(
+        path, queue_size=4, reuse_buffers=True, transform=transform
+    )
+    consumed = [frame_id(f) for f, _ in frames]
+    assert consumed == expected
+
+    if not transform.is_identity:
+        # the transformed frames are new arrays, so they can be kept
+        frames = prefetch_video_frames_with_timestamp(
+            path, queue_size=4, reuse_buffers=True, transform=transform
+        )
+        kept = [f for f, _ in frames]
+        assert [frame_id(f) for f in kept] == expected
@@ -0,0 +1,39 @@
+"""Tests for the batched and parallel distances of fastdtw."""
+
+import numpy as np
+
+from climbing_wire.fastdtw.fastdtw import fastdtw
+from climbing_wire.fastdtw.parallel import ProcessPoolDistance
+from climbing_wire.video.frame import Frame
+
+
+def mean_abs_dist(a: Frame, b: Frame) -> float:
+    """Mean absolute difference between two frames."""
+    return float(np.abs(a.frame.astype(float) - b.frame.astype(float)).mean())
+
+
+def random_frames(seed: int, count: int) -> list[Frame]:
+    """Small random frames, drifting over time."""
+    rng = np.random.default_rng(seed)
+    base = rng.integers(0, 200, (count, 6, 8, 3))
+    imgs = (base + np.arange(count)[:, None, None, None]).astype(np.uint8)
+    return [Frame(frame=img, usec=k * 1000, idx=k) for k, img in enumerate(imgs)]
+
+
+def test_batched_and_parallel_distances_match_plain() -> None:
+    """The batched and the process pool distances give the same alignment."""
+    x = random_frames(0, 50)
+    y = random_frames(1, 37)
+    expected = fastdtw(x, y, radius=2, dist=mean_abs_dist)
+
+    def batch_dist(ii: np.ndarray, jj: np.ndarray) -> np.ndarray:
+        return np.array([mean_abs_dist(x[i], y[j]) for i, j in zip(ii, jj)])
+
+    assert fastdtw(x, y, radius=2, batch_dist=batch_dist) == expected
+
+    with ProcessPoolDistance(mean_abs_dist, x, y, max_workers=2, chunksize=16) as pd:
+        assert fastdtw(x, y, radius=2, batch_dist=pd) == expected
+        ii = np.array([0, 49, 3, 3])
+        jj = np.array([36, 0, 3, 4])
+        assert np.array_equal(pd(ii, jj), batch_dist(ii, jj))
+        assert len(pd(ii[:0], jj[:0])) == 0
@@ -0,0 +1,68 @@
+"""Tests for the threaded JointTracker pipeline."""
+
+from itertools import cycle, islice
+from pathlib import Path
+import threading
+
+import cv2 as cv
+import numpy as np
+import pytest
+
+from climbing_wire.joint_tracker.joint_tracker import JointTracker
+from climbing_wire.joint_tracker.pipeline import JointTrackerPipeline
+
+SAMPLE_FOL = Path(__file__).parents[1] / "data" / "sample_square"
+
+
+@pytest.fixture(scope="module")
+def clip() -> list[np.ndarray]:
+    """A person on a textured wall, with the camera panning."""
+    img = cv.imread(str(SAMPLE_FOL / "photo_1_s.jpg"))
+    img = cv.resize(img, (240, 240), interpolation=cv.INTER_AREA)
+    h, w = img.shape[:2]
+    rng = np.random.default_rng(0)
+    blocks = rng.integers(0, 256, (h // 8, w // 8, 3), dtype=np.uint8)
+    base = cv.resize(blocks, (w * 2, h * 2), interpolation=cv.INTER_NEAREST)
+    base[h // 2 : h // 2 + h, w // 2 : w // 2 + w] = img
+    return [np.roll(base, 6 * k, axis=1) for k in range(6)]
+
+
+@pytest.mark.parametrize("storage", ["hist", "stacked"])
+def test_pipeline_matches_serial_loop(clip, storage) -> None:
+    """The pipeline gives the same snapshots as processing the frames in order."""
+    serial = JointTracker(storage=storage)
+    expected = []
+    for frame in clip:
+        serial.process_next_frame(frame)
+        if hasattr(serial, "M"):
+            expected.append(serial.snapshot())
+    serial.close()
+
+    tracker = JointTracker(storage=storage)
+    snapshots = list(JointTrackerPipeline(tracker).run(clip))
+    tracker.close()
+
+    assert len(snapshots) == len(expected) == len(clip) - 1
+    # RANSAC is randomized, so the homographies differ slightly between runs
+    for snap, snap_exp in zip(snapshots, expected):
+        assert np.allclose(snap.M, snap_exp.M, atol=1e-2)
+        for joint_name in tracker.joint_names:
+            jh, jh_exp = snap.joint_hists[joint_name], snap_exp.joint_hists[joint_name]
+            assert len(jh) == len(jh_exp)
+            assert np.allclose(jh.track, jh_exp.track, atol=0.5)
+            assert np.allclose(jh.visibility, jh_exp.visibility, atol=1e-3)
+    assert len(snapshots[-1].joint_hists["left_hand"]) == len(clip) - 1
+
+
+def test_pipeline_stops_when_consumer_breaks(clip) -> None:
+    """Breaking out of the iteration stops all the stage threads."""
+    threads_before = set(threading.enumerate())
+    tracker = JointTracker()
+    run = JointTrackerPipeline(tracker, queue_size=2).run(cycle(clip))
+    snapshots = list(islice(run, 2))
+    assert len(threading.enumerate()) > len(threads_before)
+    run.close()
+    tracker.close()
+
+    assert len(snapshots) == 2
+    assert set(threading.enumerate()) <= threads_before
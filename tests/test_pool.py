@@ -0,0 +1,57 @@
+"""Tests for the pool of MediaPipe Pose workers."""
+
+from pathlib import Path
+
+import cv2 as cv
+import numpy as np
+import pytest
+
+from climbing_wire.landmark.compute import PoseImg
+from climbing_wire.landmark.pool import PoseImgPool
+
+SAMPLE_FOL = Path(__file__).parents[1] / "data" / "sample_square"
+
+
+@pytest.fixture(scope="module")
+def frames() -> list[np.ndarray]:
+    """A person moving across the frame."""
+    img = cv.imread(str(SAMPLE_FOL / "photo_1_s.jpg"))
+    h, w = img.shape[:2]
+    frames = []
+    for k in range(8):
+        frame = np.full((h * 2, w * 2, 3), 120, np.uint8)
+        y, x = h // 2 + 5 * k, w // 2 + 8 * k
+        frame[y : y + h, x : x + w] = img
+        frames.append(frame)
+    return frames
+
+
+def test_split_tasks_primes_the_first_chunk() -> None:
+    """The frames of the previous call are only used as warmup."""
+    pool = PoseImgPool(num_workers=2, chunk_overlap=3)
+    try:
+        assert pool._split_tasks(8) == [([0, 1, 2, 3], 0), ([1, 2, 3, 4, 5, 6, 7], 3)]
+        assert pool._split_tasks(8, 2) == [
+            ([0, 1, 2, 3, 4, 5], 2),
+            ([3, 4, 5, 6, 7, 8, 9], 3),
+        ]
+    finally:
+        pool.close()
+
+
+@pytest.mark.parametrize("static_image_mode", [True, False])
+def test_pool_after_pose_img(frames, static_image_mode: bool) -> None:
+    """The workers run even if the parent already used a PoseImg."""
+    with PoseImg(static_image_mode=static_image_mode) as pose_img:
+        expected = [pose_img(frame) for frame in frames]
+    assert all(lli is not None for lli in expected)
+
+    with PoseImgPool(num_workers=2, static_image_mode=static_image_mode) as pool:
+        landlists = pool(frames[:4])
+        landlists += pool(frames[4:])
+        assert len(pool._prime_frames) == (0 if static_image_mode else len(frames))
+
+    assert len(landlists) == len(frames)
+    for lli, lli_exp in zip(landlists, expected):
+        assert lli is not None
+        assert np.allclose(lli.to_array()[:, :2], lli_exp.to_array()[:, :2], atol=20)
@@ -0,0 +1,91 @@
+"""Tests for the homographies along a stream of frames."""
+
+import numpy as np
+import pytest
+
+from climbing_wire.homography.stream import (
+    KeyframeHomography,
+    KltHomography,
+    StreamHomography,
+    iterate_frame_homographies,
+)
+
+
+def test_failed_frame_is_yielded_and_kept_as_reference(textured_image) -> None:
+    """A failed homography does not stop the stream."""
+    img = textured_image(0)
+    shifted = np.roll(img, 16, axis=1)
+    blank = np.zeros_like(img)
+    frames = [img, shifted, blank, img, shifted]
+
+    results = list(iterate_frame_homographies(iter(frames)))
+
+    assert [frame is f for (frame, _), f in zip(results, frames[1:])] == [True] * 4
+    Ms = [M for _, M in results]
+    assert Ms[1] is None
+    # the blank frame is the reference of the next one
+    assert Ms[2] is None
+    assert Ms[0][0, 2] == pytest.approx(16, abs=0.5)
+    assert Ms[3][0, 2] == pytest.approx(16, abs=0.5)
+
+
+def test_klt_failure_is_reported(textured_image) -> None:
+    """KLT raises when both the tracking and the SIFT fallback fail."""
+    img = textured_image(0)
+    shifted = np.roll(img, 6, axis=1)
+    blank = np.zeros_like(img)
+    klt = KltHomography()
+
+    assert klt(img) is None
+    M = klt(shifted)
+    assert M[0, 2] == pytest.approx(6, abs=0.5)
+    with pytest.raises(ValueError):
+        klt(blank)
+    # the blank frame is the reference of the next one
+    with pytest.raises(ValueError):
+        klt(img)
+    M = klt(shifted)
+    assert M[0, 2] == pytest.approx(6, abs=0.5)
+
+
+def test_keyframe_failure_matches_stream(textured_image) -> None:
+    """A frame that fails both matches still becomes the reference."""
+    img = textured_image(0)
+    shifted = np.roll(img, 16, axis=1)
+    blank = np.zeros_like(img)
+    frames = [img, shifted, blank, shifted]
+
+    for motion in (StreamHomography(), KeyframeHomography()):
+        Ms = [M for _, M in iterate_frame_homographies(iter(frames), motion)]
+        assert len(Ms) == 3
+        assert Ms[0][0, 2] == pytest.approx(16, abs=0.5)
+        # the blank frame is the reference of the next one
+        assert Ms[1:] == [None, None]
+
+
+def test_klt_fallback_reuses_features(textured_image, monkeypatch) -> None:
+    """Consecutive SIFT fallbacks extract the features once per frame."""
+    img = textured_image(0)
+    shifted = np.roll(img, 6, axis=1)
+    blank = np.zeros_like(img)
+    klt = KltHomography()
+    calls = []
+    compute_features = klt.estimator.compute_features
+    monkeypatch.setattr(
+        klt.estimator,
+        "compute_features",
+        lambda gray: calls.append(gray) or compute_features(gray),
+    )
+
+    assert klt(img) is None
+    with pytest.raises(ValueError):
+        klt(blank)
+    assert len(calls) == 2
+    # no points to track on the blank frame, only the new frame is extracted
+    with pytest.raises(ValueError):
+        klt(img)
+    assert len(calls) == 3
+    with pytest.raises(ValueError):
+        klt(blank)
+    assert len(calls) == 4
+    assert klt.fallback_count == 3